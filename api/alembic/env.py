@@ -36,6 +36,7 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 from models.users import Users, Session
 from models.tasks import Tasks
+from models.task_stats import TaskStats
 
 from models.connection import Base
 target_metadata = Base.metadata
@@ -46,6 +47,14 @@ target_metadata = Base.metadata
 # ... etc.
 
 
+# The FTS5 table and its shadow tables are built by raw SQL in a migration and have no model,
+# autogenerate must not treat them as tables to drop
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == "table" and name.startswith("tasks_fts"):
+        return False
+    return True
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -64,6 +73,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -85,7 +95,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,56 @@
+"""add task search index
+
+Revision ID: 3c5e1f9a7b21
+Revises: 88b24eda9a3f
+Create Date: 2026-10-18 10:12:41.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c5e1f9a7b21'
+down_revision: Union[str, None] = '88b24eda9a3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("CREATE VIRTUAL TABLE tasks_fts USING fts5(task_title, task_description, tokenize='unicode61 remove_diacritics 2')")
+
+    # Only live tasks are indexed, a soft delete removes the row from the index
+    op.execute("""
+        CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks WHEN new.deleted_at IS NULL BEGIN
+            INSERT INTO tasks_fts(rowid, task_title, task_description) VALUES (new.task_id, new.task_title, new.task_description);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER tasks_fts_update AFTER UPDATE OF task_title, task_description, deleted_at ON tasks BEGIN
+            DELETE FROM tasks_fts WHERE rowid = old.task_id;
+            INSERT INTO tasks_fts(rowid, task_title, task_description)
+                SELECT new.task_id, new.task_title, new.task_description WHERE new.deleted_at IS NULL;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            DELETE FROM tasks_fts WHERE rowid = old.task_id;
+        END
+    """)
+
+    op.execute("INSERT INTO tasks_fts(rowid, task_title, task_description) SELECT task_id, task_title, task_description FROM tasks WHERE deleted_at IS NULL")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS tasks_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS tasks_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS tasks_fts_insert")
+    op.execute("DROP TABLE IF EXISTS tasks_fts")
@@ -0,0 +1,26 @@
+"""add tasks updated_at index
+
+Revision ID: 5b8e2d17c9a4
+Revises: a7d2c4e8f013
+Create Date: 2026-10-18 14:37:05.118842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e2d17c9a4'
+down_revision: Union[str, None] = 'a7d2c4e8f013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_tasks_updated_at', 'tasks', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_updated_at', table_name='tasks')
@@ -0,0 +1,61 @@
+"""hash session tokens
+
+Revision ID: 9f3b7c2a1d64
+Revises: d41f6a0c8e52
+Create Date: 2026-10-18 16:48:12.207114
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9f3b7c2a1d64'
+down_revision: Union[str, None] = 'd41f6a0c8e52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+user_session = sa.table('user_session', sa.column('session_id', sa.Integer), sa.column('session_token', sa.String))
+
+
+def upgrade() -> None:
+    # Replace every stored JWT with its sha256 digest before the column shrinks
+    connection = op.get_bind()
+    last_id    = 0
+    while True:
+        rows = connection.execute(
+            sa.select(user_session.c.session_id, user_session.c.session_token)
+            .where(user_session.c.session_id > last_id)
+            .order_by(user_session.c.session_id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        changes = [
+            {"b_session_id": session_id, "b_session_token": hashlib.sha256(token.encode("utf-8")).hexdigest()}
+            for session_id, token in rows if token and len(token) != 64
+        ]
+        if changes:
+            connection.execute(
+                user_session.update()
+                .where(user_session.c.session_id == sa.bindparam('b_session_id'))
+                .values(session_token=sa.bindparam('b_session_token')),
+                changes,
+            )
+        last_id = rows[-1][0]
+
+    with op.batch_alter_table('user_session') as batch_op:
+        batch_op.alter_column('session_token', existing_type=sa.String(length=955), type_=sa.String(length=64), existing_nullable=True, comment='sha256 hex digest of the JWT')
+    op.create_index('ix_user_session_session_expiry', 'user_session', ['session_expiry'], unique=False)
+
+
+# Hashes cannot be turned back into tokens, sessions stored as hashes stop matching and their users sign in again
+def downgrade() -> None:
+    op.drop_index('ix_user_session_session_expiry', table_name='user_session')
+    with op.batch_alter_table('user_session') as batch_op:
+        batch_op.alter_column('session_token', existing_type=sa.String(length=64), type_=sa.String(length=955), existing_nullable=True, comment=None)
@@ -0,0 +1,41 @@
+"""add hot query indexes
+
+Revision ID: a7d2c4e8f013
+Revises: 3c5e1f9a7b21
+Create Date: 2026-10-18 11:02:17.904361
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d2c4e8f013'
+down_revision: Union[str, None] = '3c5e1f9a7b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Backends without partial indexes get deleted_at as the leading column instead
+    partial   = op.get_bind().dialect.name in ('sqlite', 'postgresql')
+    live_rows = {'sqlite_where': sa.text('deleted_at IS NULL'), 'postgresql_where': sa.text('deleted_at IS NULL')}
+
+    op.create_index(op.f('ix_user_session_session_token'), 'user_session', ['session_token'], unique=False)
+    if partial:
+        op.create_index('ix_users_user_email_live', 'users', ['user_email'], unique=False, **live_rows)
+        op.create_index('ix_tasks_status_live', 'tasks', ['task_status', 'task_id'], unique=False, **live_rows)
+        op.create_index('ix_tasks_title_live', 'tasks', ['task_title'], unique=False, **live_rows)
+    else:
+        op.create_index('ix_users_user_email_live', 'users', ['user_email', 'deleted_at'], unique=False)
+        op.create_index('ix_tasks_status_live', 'tasks', ['deleted_at', 'task_status', 'task_id'], unique=False)
+        op.create_index('ix_tasks_title_live', 'tasks', ['deleted_at', 'task_title'], unique=False, mysql_length={'task_title': 255})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_title_live', table_name='tasks')
+    op.drop_index('ix_tasks_status_live', table_name='tasks')
+    op.drop_index('ix_users_user_email_live', table_name='users')
+    op.drop_index(op.f('ix_user_session_session_token'), table_name='user_session')
@@ -0,0 +1,84 @@
+"""scope task search by owner
+
+Revision ID: b2c8f4e1a937
+Revises: e6a1b9d3c705
+Create Date: 2026-10-18 20:04:19.381652
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2c8f4e1a937'
+down_revision: Union[str, None] = 'e6a1b9d3c705'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def drop_search_index() -> None:
+    op.execute("DROP TRIGGER IF EXISTS tasks_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS tasks_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS tasks_fts_insert")
+    op.execute("DROP TABLE IF EXISTS tasks_fts")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    drop_search_index()
+
+    # task_owner holds 'u' || task_user_id, a search matches it first so only the user's rows are visited
+    op.execute("CREATE VIRTUAL TABLE tasks_fts USING fts5(task_title, task_description, task_owner, tokenize='unicode61 remove_diacritics 2')")
+    # The owner column is in every row of the user, it gets no weight in the bm25 rank
+    op.execute("INSERT INTO tasks_fts(tasks_fts, rank) VALUES('rank', 'bm25(1.0, 1.0, 0.0)')")
+
+    op.execute("""
+        CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks WHEN new.deleted_at IS NULL BEGIN
+            INSERT INTO tasks_fts(rowid, task_title, task_description, task_owner) VALUES (new.task_id, new.task_title, new.task_description, 'u' || new.task_user_id);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER tasks_fts_update AFTER UPDATE OF task_title, task_description, task_user_id, deleted_at ON tasks BEGIN
+            DELETE FROM tasks_fts WHERE rowid = old.task_id;
+            INSERT INTO tasks_fts(rowid, task_title, task_description, task_owner)
+                SELECT new.task_id, new.task_title, new.task_description, 'u' || new.task_user_id WHERE new.deleted_at IS NULL;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            DELETE FROM tasks_fts WHERE rowid = old.task_id;
+        END
+    """)
+
+    op.execute("INSERT INTO tasks_fts(rowid, task_title, task_description, task_owner) SELECT task_id, task_title, task_description, 'u' || task_user_id FROM tasks WHERE deleted_at IS NULL")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    drop_search_index()
+
+    op.execute("CREATE VIRTUAL TABLE tasks_fts USING fts5(task_title, task_description, tokenize='unicode61 remove_diacritics 2')")
+    op.execute("""
+        CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks WHEN new.deleted_at IS NULL BEGIN
+            INSERT INTO tasks_fts(rowid, task_title, task_description) VALUES (new.task_id, new.task_title, new.task_description);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER tasks_fts_update AFTER UPDATE OF task_title, task_description, deleted_at ON tasks BEGIN
+            DELETE FROM tasks_fts WHERE rowid = old.task_id;
+            INSERT INTO tasks_fts(rowid, task_title, task_description)
+                SELECT new.task_id, new.task_title, new.task_description WHERE new.deleted_at IS NULL;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            DELETE FROM tasks_fts WHERE rowid = old.task_id;
+        END
+    """)
+    op.execute("INSERT INTO tasks_fts(rowid, task_title, task_description) SELECT task_id, task_title, task_description FROM tasks WHERE deleted_at IS NULL")
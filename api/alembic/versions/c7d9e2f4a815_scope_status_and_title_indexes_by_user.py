@@ -0,0 +1,48 @@
+"""scope status and title indexes by user
+
+Revision ID: c7d9e2f4a815
+Revises: b2c8f4e1a937
+Create Date: 2026-10-18 21:37:52.114906
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d9e2f4a815'
+down_revision: Union[str, None] = 'b2c8f4e1a937'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Every task query filters on the owner first, the global status and title indexes were never picked once it did
+def upgrade() -> None:
+    # Backends without partial indexes get deleted_at right after the owner instead
+    partial   = op.get_bind().dialect.name in ('sqlite', 'postgresql')
+    live_rows = {'sqlite_where': sa.text('deleted_at IS NULL'), 'postgresql_where': sa.text('deleted_at IS NULL')}
+
+    if partial:
+        op.create_index('ix_tasks_user_status_live', 'tasks', ['task_user_id', 'task_status', 'task_id'], unique=False, **live_rows)
+        op.create_index('ix_tasks_user_title_live', 'tasks', ['task_user_id', 'task_title'], unique=False, **live_rows)
+    else:
+        op.create_index('ix_tasks_user_status_live', 'tasks', ['task_user_id', 'deleted_at', 'task_status', 'task_id'], unique=False)
+        op.create_index('ix_tasks_user_title_live', 'tasks', ['task_user_id', 'deleted_at', 'task_title'], unique=False, mysql_length={'task_title': 255})
+    op.drop_index('ix_tasks_title_live', table_name='tasks')
+    op.drop_index('ix_tasks_status_live', table_name='tasks')
+
+
+def downgrade() -> None:
+    partial   = op.get_bind().dialect.name in ('sqlite', 'postgresql')
+    live_rows = {'sqlite_where': sa.text('deleted_at IS NULL'), 'postgresql_where': sa.text('deleted_at IS NULL')}
+
+    if partial:
+        op.create_index('ix_tasks_status_live', 'tasks', ['task_status', 'task_id'], unique=False, **live_rows)
+        op.create_index('ix_tasks_title_live', 'tasks', ['task_title'], unique=False, **live_rows)
+    else:
+        op.create_index('ix_tasks_status_live', 'tasks', ['deleted_at', 'task_status', 'task_id'], unique=False)
+        op.create_index('ix_tasks_title_live', 'tasks', ['deleted_at', 'task_title'], unique=False, mysql_length={'task_title': 255})
+    op.drop_index('ix_tasks_user_title_live', table_name='tasks')
+    op.drop_index('ix_tasks_user_status_live', table_name='tasks')
@@ -0,0 +1,30 @@
+"""scope task indexes by user
+
+Revision ID: d41f6a0c8e52
+Revises: 5b8e2d17c9a4
+Create Date: 2026-10-18 16:02:44.530917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41f6a0c8e52'
+down_revision: Union[str, None] = '5b8e2d17c9a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_tasks_user_live', 'tasks', ['task_user_id', 'deleted_at', 'task_id'], unique=False)
+    op.create_index('ix_tasks_user_updated_at', 'tasks', ['task_user_id', 'updated_at'], unique=False)
+    op.drop_index('ix_tasks_updated_at', table_name='tasks')
+
+
+def downgrade() -> None:
+    op.create_index('ix_tasks_updated_at', 'tasks', ['updated_at'], unique=False)
+    op.drop_index('ix_tasks_user_updated_at', table_name='tasks')
+    op.drop_index('ix_tasks_user_live', table_name='tasks')
@@ -0,0 +1,45 @@
+"""add task stats
+
+Revision ID: e6a1b9d3c705
+Revises: 9f3b7c2a1d64
+Create Date: 2026-10-18 18:21:37.640158
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a1b9d3c705'
+down_revision: Union[str, None] = '9f3b7c2a1d64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('task_stats',
+    sa.Column('task_stats_id', sa.Integer(), nullable=False),
+    sa.Column('task_user_id', sa.Integer(), nullable=False),
+    sa.Column('task_status', sa.String(length=255), nullable=False),
+    sa.Column('task_due_date', sa.Date(), nullable=True),
+    sa.Column('task_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['task_user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('task_stats_id')
+    )
+    op.create_index('ix_task_stats_user_key', 'task_stats', ['task_user_id', 'task_status', 'task_due_date'], unique=True)
+
+    # Counters start from the live tasks, the application keeps them in step from here on
+    op.execute("""
+        INSERT INTO task_stats (task_user_id, task_status, task_due_date, task_count)
+        SELECT task_user_id, COALESCE(task_status, '0'), task_due_date, COUNT(task_id)
+        FROM tasks
+        WHERE deleted_at IS NULL AND task_user_id IS NOT NULL
+        GROUP BY task_user_id, COALESCE(task_status, '0'), task_due_date
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_stats_user_key', table_name='task_stats')
+    op.drop_table('task_stats')
@@ -0,0 +1,69 @@
+"""unique live task titles
+
+Revision ID: f3a8d6b2c190
+Revises: c7d9e2f4a815
+Create Date: 2026-10-18 23:12:40.318274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a8d6b2c190'
+down_revision: Union[str, None] = 'c7d9e2f4a815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Function to give every live duplicate title of a user a " (n)" suffix, the oldest task keeps the title
+def rename_duplicate_titles(bind) -> None:
+    duplicates = bind.execute(sa.text("""
+        SELECT task_user_id, task_title FROM tasks
+        WHERE deleted_at IS NULL
+        GROUP BY task_user_id, task_title
+        HAVING COUNT(task_id) > 1
+    """)).all()
+
+    for task_user_id, task_title in duplicates:
+        task_ids = bind.execute(sa.text("""
+            SELECT task_id FROM tasks
+            WHERE task_user_id = :task_user_id AND task_title = :task_title AND deleted_at IS NULL
+            ORDER BY task_id
+        """), {"task_user_id": task_user_id, "task_title": task_title}).scalars().all()
+
+        suffix = 1
+        for task_id in task_ids[1:]:
+            while True:
+                suffix += 1
+                renamed = f"{task_title} ({suffix})"
+                taken   = bind.execute(sa.text("""
+                    SELECT 1 FROM tasks
+                    WHERE task_user_id = :task_user_id AND task_title = :task_title AND deleted_at IS NULL
+                """), {"task_user_id": task_user_id, "task_title": renamed}).first()
+                if taken is None:
+                    break
+            bind.execute(sa.text("UPDATE tasks SET task_title = :task_title WHERE task_id = :task_id"), {"task_title": renamed, "task_id": task_id})
+
+
+# The duplicate title check of the task routes runs outside the write lock, the unique index closes that race
+def upgrade() -> None:
+    # Backends without partial indexes keep the plain index, a unique one would also cover removed tasks
+    partial   = op.get_bind().dialect.name in ('sqlite', 'postgresql')
+    live_rows = {'sqlite_where': sa.text('deleted_at IS NULL'), 'postgresql_where': sa.text('deleted_at IS NULL')}
+
+    if partial:
+        rename_duplicate_titles(op.get_bind())
+        op.drop_index('ix_tasks_user_title_live', table_name='tasks')
+        op.create_index('ix_tasks_user_title_live', 'tasks', ['task_user_id', 'task_title'], unique=True, **live_rows)
+
+
+def downgrade() -> None:
+    partial   = op.get_bind().dialect.name in ('sqlite', 'postgresql')
+    live_rows = {'sqlite_where': sa.text('deleted_at IS NULL'), 'postgresql_where': sa.text('deleted_at IS NULL')}
+
+    if partial:
+        op.drop_index('ix_tasks_user_title_live', table_name='tasks')
+        op.create_index('ix_tasks_user_title_live', 'tasks', ['task_user_id', 'task_title'], unique=False, **live_rows)
@@ -0,0 +1,232 @@
+"""End to end latency and throughput of the main API flows with concurrent clients, checked against a baseline.
+
+    python -m benchmarks.api_benchmark --users 10 --tasks-per-user 1000 --requests 400 --concurrency 10
+    python -m benchmarks.api_benchmark --baseline benchmarks/baseline.json          # exits 1 on a regression
+    python -m benchmarks.api_benchmark --write-baseline benchmarks/baseline.json    # refresh after an intended change
+
+Baselines are machine specific, write one on the CI runner itself before comparing against it.
+"""
+import argparse, asyncio, itertools, json, os, random, statistics, sys, time
+
+from benchmarks.common import setup_database, close_database, auth_headers, summarize, print_table, BENCH_EMAIL, BENCH_PASSWORD, START_DIR
+
+PAGE_SIZE = 15
+COLUMNS   = ("name", "requests", "errors", "shed", "throughput", "mean_ms", "p50_ms", "p95_ms", "p99_ms")
+
+
+def user_email(user_index: int) -> str:
+    return BENCH_EMAIL if user_index == 0 else f"bench{user_index}@example.com"
+
+
+# Function to read the seeded task ids of every user, shuffled so detail and edit calls spread over the table
+def seeded_task_ids(users: int, seed: int) -> list:
+    from models.connection import SessionMaker
+    from models.users import Users
+    from models.tasks import Tasks
+
+    shuffle = random.Random(seed).shuffle
+    db = SessionMaker()
+    try:
+        task_ids = []
+        for user_index in range(users):
+            user = db.query(Users).filter(Users.user_email == user_email(user_index)).first()
+            ids  = [task_id for (task_id,) in db.query(Tasks.task_id).filter(Tasks.task_user_id == user.user_id)]
+            shuffle(ids)
+            task_ids.append(ids)
+        return task_ids
+    finally:
+        db.close()
+
+
+def build_scenarios(args, headers: list, task_ids: list) -> list:
+    rng       = random.Random(args.seed)
+    titles    = itertools.count()
+    removable = [(user_index, task_id) for user_index in range(len(headers)) for task_id in task_ids[user_index]]
+    deep_page = max(1, args.tasks_per_user // PAGE_SIZE)
+
+    def user_of(worker: int) -> int:
+        return worker % len(headers)
+
+    def sign_in(client, worker):
+        return client.post("/auth/sign-in", data={"user_email": user_email(user_of(worker)), "user_password": BENCH_PASSWORD})
+
+    def task_list(**form):
+        def call(client, worker):
+            return client.post("/task/task-list", data=form, headers=headers[user_of(worker)])
+        return call
+
+    def task_list_search(client, worker):
+        return client.post("/task/task-list", data={"skip": "1", "search": f"number {rng.randint(1, 99)}"}, headers=headers[user_of(worker)])
+
+    def task_detail(client, worker):
+        return client.post("/task/task-detail", data={"task_id": rng.choice(task_ids[user_of(worker)])}, headers=headers[user_of(worker)])
+
+    def task_stats(client, worker):
+        return client.get("/task/stats", headers=headers[user_of(worker)])
+
+    def add_task(client, worker):
+        return client.post("/task/add-or-edit-task", data={
+            "task_title"       : f"benchmark add {next(titles)}",
+            "task_description" : "added by the benchmark",
+            "task_due_date"    : "2030-01-01",
+            "task_status"      : "0",
+        }, headers=headers[user_of(worker)])
+
+    def edit_task(client, worker):
+        return client.post("/task/add-or-edit-task", data={
+            "task_id"          : rng.choice(task_ids[user_of(worker)]),
+            "task_title"       : f"benchmark edit {next(titles)}",
+            "task_description" : "edited by the benchmark",
+            "task_status"      : str(rng.randint(0, 2)),
+        }, headers=headers[user_of(worker)])
+
+    # Removal runs last and every call takes a different seeded task, signed in as its owner
+    def remove_task(client, worker):
+        user_index, task_id = removable.pop()
+        return client.post("/task/task-remove", data={"task_id": task_id}, headers=headers[user_index])
+
+    cursor = str(max(task_ids[0]) // 2)
+    return [
+        ("sign_in",           sign_in,                                                     args.sign_in_requests,                   args.sign_in_concurrency),
+        ("task_list_shallow", task_list(skip="1"),                                         args.requests,                           args.concurrency),
+        ("task_list_deep",    task_list(skip=str(deep_page)),                              args.requests,                           args.concurrency),
+        ("task_list_status",  task_list(skip="2", status_filter="1"),                      args.requests,                           args.concurrency),
+        ("task_list_search",  task_list_search,                                            args.requests,                           args.concurrency),
+        ("task_list_cursor",  task_list(after_task_id=cursor, count_mode="has_more"),      args.requests,                           args.concurrency),
+        ("task_detail",       task_detail,                                                 args.requests,                           args.concurrency),
+        ("task_stats",        task_stats,                                                  args.requests,                           args.concurrency),
+        ("add_task",          add_task,                                                    args.requests,                           args.concurrency),
+        ("edit_task",         edit_task,                                                   args.requests,                           args.concurrency),
+        ("remove_task",       remove_task,                                                 args.requests,                           args.concurrency),
+    ]
+
+
+# Function to run one scenario with a fixed number of requests shared by the concurrent clients
+# A 503 is load shedding by the password pool, it is counted apart and kept out of the latencies
+async def run_scenario(client, name: str, call, requests: int, concurrency: int) -> dict:
+    samples = []
+    errors  = 0
+    shed    = 0
+    tickets = itertools.count()
+
+    async def worker(worker_index: int):
+        nonlocal errors, shed
+        while next(tickets) < requests:
+            begin    = time.perf_counter()
+            response = await call(client, worker_index)
+            if response.status_code == 503:
+                shed += 1
+                continue
+            samples.append(time.perf_counter() - begin)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(worker_index) for worker_index in range(concurrency)))
+    row = summarize(name, samples or [0.0], time.perf_counter() - started)
+    row["errors"] = errors
+    row["shed"]   = shed
+    return row
+
+
+# Function to merge the rounds of a scenario, the median of every timing and the sum of the failures
+def median_row(rounds: list) -> dict:
+    row = {"name": rounds[0]["name"], "requests": sum(result["requests"] for result in rounds)}
+    for key in ("throughput", "mean_ms", "p50_ms", "p95_ms", "p99_ms"):
+        row[key] = round(statistics.median(result[key] for result in rounds), 3)
+    for key in ("errors", "shed"):
+        row[key] = sum(result[key] for result in rounds)
+    return row
+
+
+# Function to list every scenario that got slower or failed compared to the baseline
+# The gate uses p50 and throughput, p95 and p99 of a few hundred requests swing too much between runs to fail a build on
+def find_regressions(rows: list, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    results     = baseline.get("results", {})
+    for row in rows:
+        if row["errors"]:
+            regressions.append(f"{row['name']}: {row['errors']} failed requests")
+        expected = results.get(row["name"])
+        if not expected:
+            continue
+        if row["p50_ms"] > expected["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{row['name']}: p50 {row['p50_ms']}ms against baseline {expected['p50_ms']}ms")
+        if row["throughput"] < expected["throughput"] * (1 - tolerance):
+            regressions.append(f"{row['name']}: throughput {row['throughput']}/s against baseline {expected['throughput']}/s")
+    return regressions
+
+
+async def run(args) -> int:
+    import httpx
+    from main import app
+
+    task_ids = seeded_task_ids(args.users, args.seed)
+    headers  = [auth_headers(user_index) for user_index in range(min(args.users, args.concurrency))]
+
+    scenarios = build_scenarios(args, headers, task_ids)
+    warmup    = dict((name, call) for name, call, _, _ in scenarios)["task_list_shallow"]
+
+    rows = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async with app.router.lifespan_context(app):
+            await run_scenario(client, "warmup", warmup, 50, args.concurrency)
+            for name, call, requests, concurrency in scenarios:
+                if args.only and name not in args.only:
+                    continue
+                rounds = [await run_scenario(client, name, call, requests, concurrency) for _ in range(args.rounds)]
+                rows.append(median_row(rounds))
+    await close_database()
+
+    print_table(rows, COLUMNS)
+    settings = {key: getattr(args, key) for key in ("users", "tasks_per_user", "requests", "sign_in_requests", "concurrency", "sign_in_concurrency", "rounds", "seed")}
+    report   = {"settings": settings, "results": {row["name"]: row for row in rows}}
+
+    if args.output:
+        with open(os.path.join(START_DIR, args.output), "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    if args.write_baseline:
+        with open(os.path.join(START_DIR, args.write_baseline), "w") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+            baseline_file.write("\n")
+        print(f"Baseline written to {args.write_baseline}")
+    if args.baseline:
+        with open(os.path.join(START_DIR, args.baseline)) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("settings") != settings:
+            print(f"Warning: baseline was recorded with {baseline.get('settings')}, this run used {settings}")
+        regressions = find_regressions(rows, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--tasks-per-user", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=400, help="requests per scenario")
+    parser.add_argument("--sign-in-requests", type=int, default=40, help="sign-in is bcrypt bound, so it gets its own count")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--sign-in-concurrency", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=3, help="every scenario runs this often and reports the median")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--only", nargs="*", help="run only these scenarios")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="compare against this baseline and exit 1 on a regression")
+    parser.add_argument("--write-baseline", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed p50 growth and throughput drop, 0.3 is 30%%")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.requests * args.rounds > min(args.users, args.concurrency) * args.tasks_per_user:
+        sys.exit("remove_task needs a seeded task per request, raise --tasks-per-user or lower --requests")
+    # The seed volume comes from the arguments, so the database is built before the app is imported
+    setup_database(users=args.users, tasks_per_user=args.tasks_per_user, migrate=True)
+    sys.exit(asyncio.run(run(args)))
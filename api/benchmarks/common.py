@@ -0,0 +1,136 @@
+import os, sys, time, tempfile, statistics
+
+# Benchmarks run against a throwaway SQLite file, this has to happen before any app module is imported
+API_DIR   = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = tempfile.mkdtemp(prefix="taskify-bench-")
+
+START_DIR = os.getcwd()  # file arguments are relative to where the benchmark was started
+
+sys.path.insert(0, API_DIR)
+os.chdir(BENCH_DIR)
+os.environ["DB_NAME"]      = "bench"
+os.environ["ASYNC_DB_URL"] = f"sqlite+aiosqlite:///{BENCH_DIR}/bench.db"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("DB_PASSWORD", "")
+
+BENCH_EMAIL    = "bench@example.com"
+BENCH_PASSWORD = "password"
+
+
+# Function to build the schema with the alembic migrations, so the FTS table, its triggers and the partial indexes exist
+def migrate_database():
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", os.path.join(API_DIR, "alembic"))
+    command.upgrade(config, "head")
+
+
+# Function to create the schema and seed users and tasks through the models
+def setup_database(users: int = 1, tasks_per_user: int = 100, migrate: bool = False):
+    from datetime import datetime
+    from models.connection import Base, engine, SessionMaker
+    from models.users import Users, Session
+    from models.tasks import Tasks
+    from models.task_stats import TaskStats
+    from middlewares.middleware import hash_password
+
+    if migrate:
+        migrate_database()
+    else:
+        Base.metadata.create_all(bind=engine)
+    password = hash_password(BENCH_PASSWORD)
+    db = SessionMaker()
+    try:
+        for user_index in range(users):
+            user = Users(
+                user_name       = f"bench {user_index}",
+                user_email      = BENCH_EMAIL if user_index == 0 else f"bench{user_index}@example.com",
+                user_password   = password,
+                user_status     = True,
+                created_at      = datetime.now(),
+            )
+            db.add(user)
+            db.flush()
+            db.add_all([
+                Tasks(
+                    task_user_id     = user.user_id,
+                    task_title       = f"task {user_index}-{task_index}",
+                    task_description = f"benchmark task number {task_index} for user {user_index}",
+                    task_status      = str(task_index % 3),
+                )
+                for task_index in range(tasks_per_user)
+            ])
+        db.commit()
+        # Seeding goes around the routers, so the stats counters are recounted once at the end
+        TaskStats.rebuild(db)
+    finally:
+        db.close()
+
+
+# Function to sign in the seeded user directly through the models and return a bearer header
+def auth_headers(user_index: int = 0) -> dict:
+    from datetime import datetime, timedelta
+    from models.connection import SessionMaker
+    from models.users import Users, Session
+    from routers.authorization import create_access_token
+
+    db = SessionMaker()
+    try:
+        email = BENCH_EMAIL if user_index == 0 else f"bench{user_index}@example.com"
+        user  = db.query(Users).filter(Users.user_email == email).first()
+        token = create_access_token({"user_id": user.user_id, "user_email": user.user_email})
+        db.add(Session(
+            session_email   = user.user_email,
+            session_token   = Session.token_hash(token),
+            session_user    = user.user_id,
+            session_expiry  = datetime.utcnow() + timedelta(days=1),
+            session_status  = True,
+        ))
+        db.commit()
+        return {"Authorization": f"Bearer {token}"}
+    finally:
+        db.close()
+
+
+# Pooled aiosqlite connections keep a worker thread each, close them so the process can exit
+async def close_database():
+    from models.connection import async_engine
+    await async_engine.dispose()
+
+
+def percentile(samples, percent):
+    ordered = sorted(samples)
+    index   = min(len(ordered) - 1, max(0, int(round(percent / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+# Summary of latencies in milliseconds
+def summarize(name: str, samples, elapsed: float) -> dict:
+    return {
+        "name"       : name,
+        "requests"   : len(samples),
+        "throughput" : round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms"    : round(statistics.mean(samples) * 1000, 3),
+        "p50_ms"     : round(percentile(samples, 50) * 1000, 3),
+        "p95_ms"     : round(percentile(samples, 95) * 1000, 3),
+        "p99_ms"     : round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+def print_table(rows, columns=("name", "requests", "throughput", "mean_ms", "p50_ms", "p95_ms", "p99_ms")):
+    print(" | ".join(f"{column:>12}" for column in columns))
+    for row in rows:
+        print(" | ".join(f"{str(row[column]):>12}" for column in columns))
+
+
+# Time sequential calls of an async function
+async def time_calls(call, iterations: int):
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        begin = time.perf_counter()
+        await call()
+        samples.append(time.perf_counter() - begin)
+    return samples, time.perf_counter() - started
@@ -0,0 +1,67 @@
+"""Read and write throughput with concurrent clients, with and without the single writer queue.
+
+    python -m benchmarks.concurrency_benchmark --seconds 5 --readers 20 --writers 20
+"""
+import argparse, asyncio, time, itertools
+
+from benchmarks.common import setup_database, close_database, auth_headers, summarize, print_table
+
+setup_database(tasks_per_user=1000)
+
+import httpx
+from main import app
+from models.write_queue import write_queue
+
+title_counter = itertools.count()
+
+
+async def client_loop(call, stop: asyncio.Event, samples: list, errors: list):
+    while not stop.is_set():
+        begin    = time.perf_counter()
+        response = await call()
+        samples.append(time.perf_counter() - begin)
+        if response.status_code != 200:
+            errors.append(response.status_code)
+
+
+async def run_mode(client, headers, seconds: float, readers: int, writers: int):
+    read_samples, write_samples, errors = [], [], []
+    stop = asyncio.Event()
+
+    read  = lambda: client.post("/task/task-list", data={"skip": "3", "status_filter": "1"}, headers=headers)
+    write = lambda: client.post("/task/add-or-edit-task", data={
+        "task_title": f"concurrent {next(title_counter)}", "task_description": "benchmark", "task_status": "0"
+    }, headers=headers)
+
+    clients = [client_loop(read, stop, read_samples, errors) for _ in range(readers)]
+    clients += [client_loop(write, stop, write_samples, errors) for _ in range(writers)]
+    asyncio.get_running_loop().call_later(seconds, stop.set)
+    started = time.perf_counter()
+    await asyncio.gather(*clients)
+    return read_samples, write_samples, errors, time.perf_counter() - started
+
+
+async def run(seconds: float, readers: int, writers: int):
+    headers   = auth_headers()
+    transport = httpx.ASGITransport(app=app)
+    rows      = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for mode in ("direct", "write_queue"):
+            if mode == "write_queue":
+                write_queue.start()
+            read_samples, write_samples, errors, elapsed = await run_mode(client, headers, seconds, readers, writers)
+            rows.append(summarize(f"{mode}_read", read_samples, elapsed))
+            rows.append(summarize(f"{mode}_write", write_samples, elapsed))
+            print(f"{mode}: {len(errors)} failed requests")
+        await write_queue.stop()
+    print_table(rows)
+    await close_database()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=20)
+    parser.add_argument("--writers", type=int, default=20)
+    arguments = parser.parse_args()
+    asyncio.run(run(arguments.seconds, arguments.readers, arguments.writers))
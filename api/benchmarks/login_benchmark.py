@@ -0,0 +1,77 @@
+"""Sign-in throughput during a login storm, and how much task traffic slows down meanwhile.
+
+    python -m benchmarks.login_benchmark --logins 200 --concurrency 50
+"""
+import argparse, asyncio, time
+
+from benchmarks.common import setup_database, close_database, auth_headers, summarize, print_table, BENCH_EMAIL, BENCH_PASSWORD
+
+setup_database(tasks_per_user=20)
+
+import httpx
+from main import app
+
+
+async def login_storm(client, logins: int, concurrency: int):
+    samples  = []
+    statuses = {}
+    queue    = asyncio.Queue()
+    for _ in range(logins):
+        queue.put_nowait(None)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            begin    = time.perf_counter()
+            response = await client.post("/auth/sign-in", data={"user_email": BENCH_EMAIL, "user_password": BENCH_PASSWORD})
+            samples.append(time.perf_counter() - begin)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return samples, time.perf_counter() - started, statuses
+
+
+async def task_traffic(client, headers, stop: asyncio.Event):
+    samples = []
+    started = time.perf_counter()
+    while not stop.is_set():
+        begin = time.perf_counter()
+        await client.post("/task/task-detail", data={"task_id": "1"}, headers=headers)
+        samples.append(time.perf_counter() - begin)
+    return samples, time.perf_counter() - started
+
+
+async def run(logins: int, concurrency: int):
+    headers   = auth_headers()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        idle_samples, idle_elapsed = await task_traffic_for(client, headers, 1.0)
+
+        stop    = asyncio.Event()
+        traffic = asyncio.create_task(task_traffic(client, headers, stop))
+        login_samples, login_elapsed, statuses = await login_storm(client, logins, concurrency)
+        stop.set()
+        busy_samples, busy_elapsed = await traffic
+
+    print_table([
+        summarize("task_idle", idle_samples, idle_elapsed),
+        summarize("task_storm", busy_samples, busy_elapsed),
+        summarize("sign_in", login_samples, login_elapsed),
+    ])
+    print(f"sign-in status codes: {statuses}")
+    await close_database()
+
+
+async def task_traffic_for(client, headers, seconds: float):
+    stop = asyncio.Event()
+    asyncio.get_running_loop().call_later(seconds, stop.set)
+    return await task_traffic(client, headers, stop)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    arguments = parser.parse_args()
+    asyncio.run(run(arguments.logins, arguments.concurrency))
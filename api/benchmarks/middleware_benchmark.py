@@ -0,0 +1,73 @@
+"""Per-request latency of /task/task-detail with the BaseHTTPMiddleware stack against the pure ASGI stack.
+
+    python -m benchmarks.middleware_benchmark --iterations 2000
+"""
+import argparse, asyncio
+
+from benchmarks.common import setup_database, close_database, auth_headers, time_calls, summarize, print_table
+
+setup_database(tasks_per_user=20)
+
+import httpx
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from main import app
+from routers import authorization, tasks
+from models.connection import AsyncSessionMaker
+from middlewares.middleware import AuthMiddleware, get_token_from_request, get_token_payload, is_session_expired
+
+
+# The previous dispatch based middleware, kept here only as the comparison baseline
+async def legacy_auth_dispatch(request: Request, call_next):
+    path = request.url.path
+    if path in AuthMiddleware.skip_paths or any(path.startswith(f"{skip_path}/") for skip_path in AuthMiddleware.skip_paths):
+        return await call_next(request)
+
+    token = get_token_from_request(request)
+    if not token:
+        raise HTTPException(status_code=401, detail="Token missing")
+    request.state.user = get_token_payload(token)
+
+    async with AsyncSessionMaker() as db:
+        session_expired = await is_session_expired(token, db)
+    if session_expired:
+        return JSONResponse(content={"status": 401, "message": "Session expired! Please log in."}, status_code=401)
+    return await call_next(request)
+
+
+async def legacy_exception_dispatch(request: Request, call_next):
+    try:
+        return await call_next(request)
+    except HTTPException as exc:
+        return JSONResponse(status_code=exc.status_code, content={"status": 401, "message": exc.detail})
+
+
+def legacy_app():
+    legacy = FastAPI(debug=False)
+    legacy.add_middleware(BaseHTTPMiddleware, dispatch=legacy_auth_dispatch)
+    legacy.add_middleware(BaseHTTPMiddleware, dispatch=legacy_exception_dispatch)
+    legacy.include_router(authorization.router, prefix="/auth")
+    legacy.include_router(tasks.router, prefix="/task")
+    return legacy
+
+
+async def run(iterations: int):
+    headers = auth_headers()
+    rows    = []
+    for name, target in [("base_http", legacy_app()), ("pure_asgi", app)]:
+        transport = httpx.ASGITransport(app=target)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            call = lambda: client.post("/task/task-detail", data={"task_id": "1"}, headers=headers)
+            await time_calls(call, 50)
+            samples, elapsed = await time_calls(call, iterations)
+        rows.append(summarize(name, samples, elapsed))
+    print_table(rows)
+    await close_database()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    asyncio.run(run(parser.parse_args().iterations))
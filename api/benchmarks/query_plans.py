@@ -0,0 +1,167 @@
+"""Checks that every hot query is served by an index, by running EXPLAIN QUERY PLAN on the statements the real code emits.
+
+    python -m benchmarks.query_plans --users 10 --tasks-per-user 1000
+
+The schema comes from the alembic migrations, so the partial indexes and the FTS table are the ones production gets.
+Exits 1 when a statement scans a table without an index, and lists the indexes no checked query used.
+"""
+import argparse, asyncio, re, sys
+
+from benchmarks.common import setup_database, close_database, auth_headers, BENCH_EMAIL, BENCH_PASSWORD
+
+TABLES     = ("tasks", "users", "user_session", "task_stats")
+TOUCHES    = re.compile(r"^(?:SCAN|SEARCH) (?:%s)\b" % "|".join(TABLES))
+FULL_SCAN  = re.compile(r"^SCAN (\w+)$")
+INDEX_USE  = re.compile(r"USING (?:COVERING )?INDEX |USING INTEGER PRIMARY KEY")
+INDEX_NAME = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+
+
+# Function to collect the SELECT statements run on the async engine while a check is active
+def capture_statements(captured: list):
+    from sqlalchemy import event
+    from models.connection import async_engine
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+def explain(statement: str, parameters) -> list:
+    from models.connection import engine
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+
+# The hot paths of the API, each one calls the code the routes call
+def build_checks(token: str):
+    from datetime import date
+    from models.connection import AsyncSessionMaker
+    from models.tasks import Tasks
+    from models.task_stats import TaskStats
+    from models.session_sweeper import SessionSweeper
+    from middlewares.middleware import is_session_expired
+    from middlewares.session_cache import session_cache
+    from models.users import Session
+
+    async def on_session(call):
+        async with AsyncSessionMaker() as db:
+            await call(db)
+
+    async def sign_in():
+        import httpx
+        from main import app
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://plans") as client:
+            response = await client.post("/auth/sign-in", data={"user_email": BENCH_EMAIL, "user_password": BENCH_PASSWORD})
+            assert response.status_code == 200, response.text
+
+    async def session_lookup(db):
+        session_cache.invalidate(Session.token_hash(token))
+        await is_session_expired(token, db)
+        await is_session_expired("not-a-stored-token", db)
+
+    async def task_list_pages(db):
+        await Tasks.all_tasks_async(db, 1, skip=1)
+        await Tasks.all_tasks_async(db, 1, skip=20)
+        await Tasks.all_tasks_async(db, 1, status_filter="1", skip=2)
+        await Tasks.all_tasks_async(db, 1, after_task_id=500, with_count=False)
+
+    async def task_search(db):
+        await Tasks.all_tasks_async(db, 1, search="number 5", skip=1)
+        await Tasks.all_tasks_async(db, 1, search="benchmark", after_task_id=500, with_count=False)
+
+    async def task_export(db):
+        async for _ in Tasks.stream_tasks_async(db, 1, status_filter="2"):
+            pass
+
+    async def task_lookups(db):
+        await Tasks.check_record_async(db, 1, "task 0-1")
+        await Tasks.find_task_by_task_id_async(db, 1, 10)
+        await Tasks.existing_titles_async(db, 1, {"task 0-1", "task 0-2"})
+        await Tasks.existing_task_keys_async(db, 1, {10, 11})
+        await Tasks.last_updated_async(db, 1)
+
+    async def task_stats(db):
+        await TaskStats.summary_async(db, 1, date.today())
+
+    async def session_sweep():
+        await SessionSweeper(batch_size=100).sweep()
+
+    return [
+        ("sign_in",        sign_in),
+        ("session_lookup", lambda: on_session(session_lookup)),
+        ("task_list",      lambda: on_session(task_list_pages)),
+        ("task_search",    lambda: on_session(task_search)),
+        ("task_export",    lambda: on_session(task_export)),
+        ("task_lookups",   lambda: on_session(task_lookups)),
+        ("task_stats",     lambda: on_session(task_stats)),
+        ("session_sweep",  session_sweep),
+    ]
+
+
+async def run(verbose: bool) -> int:
+    from models.connection import engine
+    from sqlalchemy import text
+
+    token    = auth_headers(0)["Authorization"].split(" ", 1)[1]
+    captured = []
+    capture_statements(captured)
+
+    failures = []
+    used     = set()
+    for name, call in build_checks(token):
+        captured.clear()
+        await call()
+        seen = set()
+        for statement, parameters in captured:
+            if statement in seen:
+                continue
+            seen.add(statement)
+            plan  = explain(statement, parameters)
+            # Probes of sqlite_master or pragma tables read no application table
+            if not any(TOUCHES.match(line) for line in plan):
+                continue
+            scans = [line for line in plan if FULL_SCAN.match(line)]
+            used.update(INDEX_NAME.findall("\n".join(plan)))
+            if scans or not any(INDEX_USE.search(line) for line in plan):
+                failures.append((name, statement, plan))
+            if verbose:
+                print(f"[{name}] {' '.join(statement.split())[:160]}")
+                for line in plan:
+                    print(f"    {line}")
+        print(f"{name:>15} | {len(seen)} statements checked")
+    await close_database()
+
+    with engine.connect() as connection:
+        declared = connection.execute(text(
+            f"SELECT name, tbl_name FROM sqlite_master WHERE type='index' AND sql IS NOT NULL AND tbl_name IN {TABLES} ORDER BY tbl_name, name"
+        )).all()
+    unused = [f"{table}.{index}" for index, table in declared if index not in used]
+    if unused:
+        print(f"Indexes no checked query used: {', '.join(unused)}")
+
+    for name, statement, plan in failures:
+        print(f"NO INDEX [{name}] {' '.join(statement.split())}")
+        for line in plan:
+            print(f"    {line}")
+    if failures:
+        return 1
+    print("Every checked statement uses an index")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--tasks-per-user", type=int, default=1000)
+    parser.add_argument("--verbose", action="store_true", help="print every statement with its plan")
+    args = parser.parse_args()
+    setup_database(users=args.users, tasks_per_user=args.tasks_per_user, migrate=True)
+    sys.exit(asyncio.run(run(args.verbose)))
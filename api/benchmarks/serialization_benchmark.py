@@ -0,0 +1,110 @@
+"""Cost of serializing a 1,000 row /task/task-list page, the old dict loop with JSONResponse against the response models with ORJSONResponse.
+
+    python -m benchmarks.serialization_benchmark --rows 1000 --iterations 200
+"""
+import argparse, asyncio, gc, json, time
+from datetime import datetime, timedelta
+
+from benchmarks.common import setup_database, close_database, summarize, print_table
+
+setup_database(tasks_per_user=1)
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from models.tasks import Tasks
+from routers.tasks import TaskListResponse, task_status_name
+
+
+def build_rows(rows: int):
+    today = datetime.utcnow().date()
+    return [
+        Tasks(
+            task_id          = index + 1,
+            task_title       = f"Task {index + 1}",
+            task_description = f"Description of task {index + 1}",
+            task_due_date    = today + timedelta(days=index % 30),
+            task_status      = str(index % 3),
+        )
+        for index in range(rows)
+    ]
+
+
+# The row to dict loop the task list used before the response models
+def legacy_page(tasks):
+    task_list = []
+    for task in tasks:
+        task_list.append({
+            "task_id"           : task.task_id,
+            "task_title"        : task.task_title,
+            "task_description"  : task.task_description,
+            "task_due_date"     : task.task_due_date.strftime('%Y-%m-%d') if task.task_due_date else None,
+            "task_status"       : task.task_status,
+            "task_status_name"  : task_status_name(task.task_status),
+        })
+    return JSONResponse(content={
+        "status" : 200,
+        "message": "Tasks List fetched successfully",
+        "data"   : {
+            "task_list"         : task_list,
+            "current_page"      : 1,
+            "per_page_records"  : len(tasks),
+            "total_pages"       : 1,
+            "total_records"     : len(tasks),
+            "next_cursor"       : None,
+            "has_more"          : False
+        }
+    }, status_code=200)
+
+
+def model_page(tasks):
+    response = TaskListResponse.model_validate({
+        "status" : 200,
+        "message": "Tasks List fetched successfully",
+        "data"   : {
+            "task_list"         : tasks,
+            "current_page"      : 1,
+            "per_page_records"  : len(tasks),
+            "total_pages"       : 1,
+            "total_records"     : len(tasks),
+            "next_cursor"       : None,
+            "has_more"          : False
+        }
+    })
+    return ORJSONResponse(response.model_dump(), status_code=200)
+
+
+# GC is paused while timing like timeit does, otherwise a full collection lands on whichever sample happens to trigger it
+def time_builds(build, tasks, iterations: int):
+    samples = []
+    gc.collect()
+    gc.disable()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        begin = time.perf_counter()
+        build(tasks)
+        samples.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - started
+    gc.enable()
+    return samples, elapsed
+
+
+async def run(rows: int, iterations: int):
+    tasks = build_rows(rows)
+    # Both paths must produce the same document, only the whitespace of the two encoders differs
+    assert json.loads(legacy_page(tasks).body) == json.loads(model_page(tasks).body)
+
+    results = []
+    for name, build in [("dict_json", legacy_page), ("model_orjson", model_page)]:
+        time_builds(build, tasks, 10)
+        samples, elapsed = time_builds(build, tasks, iterations)
+        results.append(summarize(name, samples, elapsed))
+    print_table(results)
+    await close_database()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.iterations))
@@ -0,0 +1,134 @@
+"""Races concurrent adds, edits, removes and bulk writes on the same tasks, then compares task_stats with a direct count.
+
+    python -m benchmarks.task_stats_check --rounds 20 --concurrency 6
+
+Exits 1 when a counter drifted from the live tasks, an edit failed, a task was reported removed more than once
+or a title was added more than once.
+"""
+import argparse, asyncio, json, random, sys
+
+from benchmarks.common import setup_database, close_database, auth_headers
+
+
+# Function to read the counters and the live tasks of every user as comparable (user, status, due date) counts
+def counts():
+    from sqlalchemy import select, func
+    from models.connection import SessionMaker
+    from models.tasks import Tasks
+    from models.task_stats import TaskStats
+
+    db = SessionMaker()
+    try:
+        live = db.execute(
+            select(Tasks.task_user_id, Tasks.task_status, Tasks.task_due_date, func.count(Tasks.task_id))
+            .filter(Tasks.deleted_at.is_(None))
+            .group_by(Tasks.task_user_id, Tasks.task_status, Tasks.task_due_date)
+        ).all()
+        stats = db.execute(select(TaskStats.task_user_id, TaskStats.task_status, TaskStats.task_due_date, TaskStats.task_count)).all()
+        return {tuple(row[:3]): row[3] for row in live}, {tuple(row[:3]): row[3] for row in stats if row[3]}
+    finally:
+        db.close()
+
+
+async def race(client, headers, task_ids, rng, concurrency: int, round_index: int) -> int:
+    task_id = rng.choice(task_ids)
+    title   = f"raced {round_index}"
+    status  = str(rng.randint(0, 2))
+    due     = rng.choice(["", "2030-01-01", "2030-01-02"])
+
+    def edit():
+        return client.post("/task/add-or-edit-task", data={
+            "task_id": task_id, "task_title": "", "task_description": "raced", "task_status": status, "task_due_date": due
+        }, headers=headers)
+
+    def bulk():
+        items = [{"task_id": task_id, "task_status": rng.randint(0, 2)}]
+        return client.post("/task/bulk-update-status", content=json.dumps(items), headers={**headers, "Content-Type": "application/json"})
+
+    def remove():
+        return client.post("/task/task-remove", data={"task_id": task_id}, headers=headers)
+
+    def add():
+        return client.post("/task/add-or-edit-task", data={
+            "task_title": title, "task_description": "raced", "task_status": status, "task_due_date": due
+        }, headers=headers)
+
+    def bulk_add():
+        items = [{"task_title": f"{title}-{index}", "task_description": "raced", "task_status": status} for index in range(3)]
+        return client.post("/task/bulk-add-tasks", content=json.dumps(items), headers={**headers, "Content-Type": "application/json"})
+
+    mode  = rng.choice(["edit", "bulk", "mixed", "remove", "add", "bulk_add"])
+    calls = {
+        "edit"     : [edit] * concurrency,
+        "bulk"     : [bulk] * concurrency,
+        "mixed"    : [rng.choice([edit, bulk]) for _ in range(concurrency)],
+        "remove"   : [remove] * concurrency,
+        "add"      : [add] * concurrency,
+        "bulk_add" : [bulk_add] * concurrency,
+    }[mode]
+    responses = await asyncio.gather(*(call() for call in calls))
+
+    if mode == "remove":
+        task_ids.remove(task_id)
+        removed = sum(1 for response in responses if response.status_code == 200)
+        if removed != 1:
+            print(f"task {task_id} was reported removed {removed} times")
+            return 1
+        return 0
+
+    # Every title must be added once however many requests race for it
+    if mode == "add":
+        added, expected = sum(1 for response in responses if response.status_code == 200), 1
+    elif mode == "bulk_add":
+        added, expected = sum(1 for response in responses for result in response.json()["data"]["results"] if result["status"] == 200), 3
+    if mode in ("add", "bulk_add"):
+        if added != expected:
+            print(f"{mode} of {title} added {added} tasks instead of {expected}")
+            return 1
+        return 0
+
+    # An edit or status update of a live task must succeed however it interleaves with the others
+    failed = [response.text for response in responses if response.status_code != 200 or any(
+        result["status"] != 200 for result in response.json().get("data", {}).get("results", [])
+    )]
+    for text in failed:
+        print(f"{mode} of task {task_id} failed: {text}")
+    return len(failed)
+
+
+async def run(args) -> int:
+    import httpx
+    from main import app
+
+    headers  = auth_headers(0)
+    rng      = random.Random(args.seed)
+    task_ids = list(range(1, args.tasks + 1))
+    failures = 0
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://check", timeout=60) as client:
+        async with app.router.lifespan_context(app):
+            for round_index in range(args.rounds):
+                failures += await race(client, headers, task_ids, rng, args.concurrency, round_index)
+    await close_database()
+
+    live, stats = counts()
+    for key in sorted(set(live) | set(stats), key=str):
+        if live.get(key, 0) != stats.get(key, 0):
+            print(f"user {key[0]} status {key[1]} due {key[2]}: task_stats {stats.get(key, 0)}, live tasks {live.get(key, 0)}")
+            failures += 1
+    if failures:
+        return 1
+    print(f"task_stats matches the live tasks after {args.rounds} rounds of {args.concurrency} concurrent writes")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=40)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    setup_database(users=1, tasks_per_user=args.tasks, migrate=True)
+    sys.exit(asyncio.run(run(args)))
@@ -1,16 +1,42 @@
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI,Request
 from routers import authorization, tasks
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from routers.logging_config import setup_logging
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
-from middlewares.middleware import auth_middleware, ExceptionHandlingMiddleware
+from middlewares.middleware import AuthMiddleware, DBSessionMiddleware, ExceptionHandlingMiddleware, RequestLogMiddleware, MetricsMiddleware
+from middlewares.revocation import revocation_list
+from middlewares.password_pool import password_pool
+from models.pool_metrics import pool_metrics, pool_metric_lines
+from models.request_metrics import render_metrics
+from models.connection import async_engine
+from models.write_queue import write_queue, WRITE_QUEUE_ENABLED
+from models.task_events import task_event_hub
+from models.session_sweeper import session_sweeper, SESSION_SWEEPER_ENABLED
 
 setup_logging()
 
 logger = logging.getLogger(__name__)
-app = FastAPI(debug=False)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    revocation_list.load()
+    if WRITE_QUEUE_ENABLED:
+        write_queue.start()
+    if SESSION_SWEEPER_ENABLED:
+        session_sweeper.start()
+    yield
+    task_event_hub.close()
+    await session_sweeper.stop()
+    await write_queue.stop()
+    await revocation_list.flush()
+    password_pool.shutdown()
+    await async_engine.dispose()
+
+
+app = FastAPI(debug=False, lifespan=lifespan)
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -23,8 +49,11 @@ async def global_exception_handler(request: Request, exc: Exception):
         },
     )
 
-app.add_middleware(BaseHTTPMiddleware, dispatch=auth_middleware)
+app.add_middleware(AuthMiddleware)
+app.add_middleware(DBSessionMiddleware)
 app.add_middleware(ExceptionHandlingMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestLogMiddleware)
 
 origins = [ 
     "http://localhost:5173", 
@@ -36,8 +65,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Request-ID"],
 )
 
+@app.get("/metrics/pool")
+async def database_pool_metrics():
+    return JSONResponse({
+        "status" : 200,
+        "message": "Pool metrics fetched successfully",
+        "data"   : pool_metrics()
+    }, status_code=200)
+
+# Prometheus text format, the path is in the auth skip list so the scraper needs no token
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(render_metrics(pool_metric_lines()), media_type="text/plain; version=0.0.4")
+
 # Include routers
 app.include_router(authorization.router, prefix="/auth")
 app.include_router(tasks.router, prefix="/task")
@@ -1,31 +1,45 @@
-import os, re,logging
+import os, re, time, logging
+from uuid import uuid4
 from typing import Optional
 from datetime import datetime
 
 
 from jose import jwt, JWTError
-from models.connection import get_db
+from models.connection import get_async_db, AsyncSessionMaker
 from models.users import Session, Users
+from middlewares.session_cache import session_cache
+from middlewares.revocation import revocation_list
+from middlewares.user_cache import user_cache
+from middlewares.password_pool import password_pool
+from routers.logging_config import bind_request, request_log_context
+from models.request_metrics import RequestStats, current_request_stats, observe_request
+from models.task_events import TASK_EVENTS_TOKEN_SECONDS
 
 from passlib.context import CryptContext
 
 from fastapi.responses import JSONResponse
-from fastapi import Request, HTTPException
+from fastapi import Request, HTTPException, Depends
+from starlette.routing import Match
 
-from sqlalchemy.orm import Session as DBSession
-from starlette.middleware.base import BaseHTTPMiddleware
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from dotenv import load_dotenv
 load_dotenv()
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 ALGORITHM  = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440
 SECRET_KEY = os.getenv('SECRET_KEY')
 
+# "session" checks user_session on every request, "stateless" trusts the signed exp claim and the revocation list
+AUTH_MODE  = os.getenv('AUTH_MODE', 'session')
+
+# A browser EventSource cannot send the Authorization header, the event stream takes a short-lived ?token= instead
+TASK_EVENTS_PATH        = "/task/events"
+TASK_EVENTS_TOKEN_SCOPE = "task-events"
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
@@ -44,82 +58,266 @@ def get_token_from_request(request: Request) -> Optional[str]:
 
 
 # Function to check if the session has expired
-async def is_session_expired(token: str, db: DBSession) -> bool:
-    session = db.query(Session).filter(Session.session_token == token, Session.session_status == 1, Session.is_deleted == 0).first()
+async def is_session_expired(token: str, db: AsyncSession) -> bool:
+    return await is_stored_session_expired(Session.token_hash(token), db)
+
+
+# Function to check a session by the token hash stored in user_session, a stream token only carries this hash
+async def is_stored_session_expired(session_token: str, db: AsyncSession) -> bool:
+    cached_expiry = session_cache.get(session_token)
+    if cached_expiry is not None and cached_expiry >= datetime.utcnow():
+        return False  # Session is still active, served from cache
+
+    result  = await db.execute(select(Session).filter(Session.session_token == session_token, Session.session_status == 1, Session.is_deleted == 0).limit(1))
+    session = result.scalars().first()
     if session:
         if session.session_expiry < datetime.utcnow():
-            session.session_status = False
-            session.is_deleted = True
-            session.updated_at = datetime.utcnow()
-            db.commit()
+            await expire_session(session, db)
             return True  # Session has expired
     else:
-        session = db.query(Session).filter(Session.session_token == token).first()
+        result  = await db.execute(select(Session).filter(Session.session_token == session_token).limit(1))
+        session = result.scalars().first()
         if session and session.session_expiry < datetime.utcnow():
-            session.session_status = False
-            session.is_deleted = True
-            session.updated_at = datetime.utcnow()
-            db.commit()
+            await expire_session(session, db)
             return True
+        session_cache.invalidate(session_token)
         return True # Session has expired
+    session_cache.set(session_token, session.session_expiry)
     return False  # Session is still active
 
 
-# this for check token and verify token in this
-async def auth_middleware(request: Request, call_next):
-    # if request.method == "OPTIONS":
-    #     response = await call_next(request)
-    #     return response
+# Function to mark a session expired and drop it from the session cache
+# The revocation list is not touched, only tokens without a jti get here in the stateless mode
+async def expire_session(session: Session, db: AsyncSession):
+    session.session_status = False
+    session.is_deleted = True
+    session.updated_at = datetime.utcnow()
+    await db.commit()
+    session_cache.invalidate(session.session_token)
+
+
+# Function to add the token id to the revocation list, only the stateless mode reads it
+def revoke_token(token: str):
+    if AUTH_MODE != "stateless":
+        return
+    payload = get_token_payload(token)
+    if payload and payload.get("jti"):
+        revocation_list.revoke(payload["jti"], payload.get("exp"))
+
 
+# Function to validate a token without database access, None when the stateless mode cannot decide
+def is_token_revoked_or_expired(payload: Optional[dict]) -> Optional[bool]:
+    if not payload:
+        return True  # Bad signature or exp in the past
+    if not payload.get("jti"):
+        return None  # Tokens issued before jti existed can only be checked against user_session
+    return revocation_list.is_revoked(payload["jti"])
 
-    skip_paths = ["/", "/docs", "/redoc", "/openapi.json", "/auth"]
 
-    if request.url.path in skip_paths or any(request.url.path.startswith(f"{path}/") for path in skip_paths):
-        response = await call_next(request)
-        return response
+# Function to issue a stream token for the task event stream from a checked access token
+# It carries the session hash and jti of the access token, so the stream gets the same session and revocation checks
+def create_stream_token(token: str, payload: dict) -> str:
+    expire = int(time.time()) + TASK_EVENTS_TOKEN_SECONDS
+    claims = {
+        "user_id"     : payload.get("user_id"),
+        "scope"       : TASK_EVENTS_TOKEN_SCOPE,
+        "sid"         : Session.token_hash(token),
+        "session_exp" : payload.get("exp"),
+        "exp"         : min(expire, payload.get("exp") or expire),
+    }
+    if payload.get("jti"):
+        claims["jti"] = payload["jti"]
+    return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
 
-    token = get_token_from_request(request)
-    if not token:
-        raise HTTPException(status_code=401, detail="Token missing")
 
+# Function to decode a stream token, None unless it is signed, unexpired and scoped to the task event stream
+def get_stream_token_payload(token: str) -> Optional[dict]:
     payload = get_token_payload(token)
-    request.state.user = payload
+    if not payload or payload.get("scope") != TASK_EVENTS_TOKEN_SCOPE or not payload.get("sid"):
+        return None
+    return payload
+
+
+# this for check token and verify token in this, a pure ASGI middleware so no extra task or body streaming per request
+class AuthMiddleware:
+    skip_paths = ["/", "/docs", "/redoc", "/openapi.json", "/auth", "/metrics"]
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if path in self.skip_paths or any(path.startswith(f"{skip_path}/") for skip_path in self.skip_paths):
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        token = get_token_from_request(request)
+        stream_token = request.query_params.get("token") if not token and path == TASK_EVENTS_PATH else None
+        if not token and not stream_token:
+            raise HTTPException(status_code=401, detail="Token missing")
+
+        # A stream token is only accepted in the query of the event stream, never as a bearer token
+        if stream_token:
+            payload       = get_stream_token_payload(stream_token)
+            session_token = payload["sid"] if payload else None
+        else:
+            payload       = get_token_payload(token)
+            payload       = None if payload and payload.get("scope") else payload
+            session_token = Session.token_hash(token)
+        request.state.user = payload
+
+        session_expired = is_token_revoked_or_expired(payload) if AUTH_MODE == "stateless" else None
+        if session_expired is None:
+            session_expired = session_token is None or await is_stored_session_expired(session_token, request.state.db)
+        if session_expired:
+            response = JSONResponse(content={"status": 401, "message": "Session expired! Please log in."}, status_code=401)
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+# One database session per request, shared by the middleware and the handlers and always closed at the end
+class DBSessionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # No connection is checked out until the first query, so requests that never touch the database stay free
+        db = AsyncSessionMaker()
+        scope.setdefault("state", {})["db"] = db
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await db.close()
+
+
+# Tags every log record of a request with its id and sampling decision, the id is echoed back as X-Request-ID
+class RequestLogMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id  = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")[:64] or uuid4().hex
+        status_code = 500
+        started     = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", []).append((b"x-request-id", request_id.encode("latin-1")))
+            await send(message)
 
-    db: DBSession = next(get_db())
-    session_expired = await is_session_expired(token, db)
-    if session_expired:
-        return JSONResponse(content={"status": 401, "message": "Session expired! Please log in."}, status_code=401)
-    response = await call_next(request)
-    return response
+        token = bind_request(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            logger.info(f"{scope['method']} {scope['path']} {status_code} {(time.perf_counter() - started) * 1000:.1f}ms")
+            request_log_context.reset(token)
+
+
+# Function to find the route template of a request, unknown paths share one label so /metrics stays bounded
+def route_template(scope) -> str:
+    app = scope.get("app")
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope["path"])
+    return "<unmatched>"
+
+
+# Per-route latency and SQL totals, the engine events add every query of the request to its RequestStats
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route       = route_template(scope)
+        stats       = RequestStats(route)
+        status_code = 500
+        started     = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = current_request_stats.set(stats)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request_stats.reset(token)
+            observe_request(scope["method"], route, status_code, time.perf_counter() - started, stats)
 
 
 # Exception Handling Middleware
-class ExceptionHandlingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+class ExceptionHandlingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
         try:
-            return await call_next(request)
+            await self.app(scope, receive, send_wrapper)
         except HTTPException as exc:
-            return JSONResponse(
+            if response_started:
+                raise
+            response = JSONResponse(
                 status_code=exc.status_code,
                 content={"status": 401, "message": exc.detail},
             )
-        except HTTPException as exc:
-            return JSONResponse(
-                status_code=exc.status_code,
-                content={"detail": exc.detail},
-            )
+            await response(scope, receive, send)
         except Exception as exc:
+            if response_started:
+                raise
             logger.error(f"Unhandled exception: {exc}", exc_info=True)
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=500,
                 content={"detail": f"An unexpected error occurred. {exc}"},
             )
+            await response(scope, receive, send)
 
 
 # Varify Password
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+# Varify Password on the bounded password pool, raises PasswordPoolFull when too many checks are waiting
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+def hash_password(plain_password: str) -> str:
+    return pwd_context.hash(plain_password)
+
 # Function to decode the token payload
 def get_token_payload(token: str) -> dict:
     try:
@@ -130,23 +328,32 @@ def get_token_payload(token: str) -> dict:
         return None
 
 
-def get_current_user(token: str , db: DBSession):
-    try:
-        payload = get_token_payload(token)
-        if not payload:
-            raise HTTPException(status_code=401, detail="Invalid token")
+async def find_active_user_async(payload: Optional[dict], db: AsyncSession):
+    if not payload or not payload.get("user_id"):
+        raise HTTPException(status_code=401, detail="Invalid token")
 
-        user_id = payload.get("user_id")
-        if not user_id:
+    user_id = payload.get("user_id")
+    user    = user_cache.get(user_id)
+    if user is None:
+        result = await db.execute(select(Users).filter(Users.user_id == user_id, Users.deleted_at.is_(None), Users.user_status==1).limit(1))
+        user   = result.scalars().first()
+        if not user:
             raise HTTPException(status_code=401, detail="Invalid token")
+        user_cache.set(user_id, user)
+    return user
 
-        if not db:
-            db = next(get_db())
 
-        user = db.query(Users).filter(Users.user_id == user_id, Users.deleted_at.is_(None), Users.user_status==1).first()
-        if not user:
-            raise HTTPException(status_code=401, detail="Invalid token")
+# Dependency resolving the authenticated Users row once per request, from the payload decoded by AuthMiddleware
+async def get_request_user(request: Request, db: AsyncSession = Depends(get_async_db)) -> Users:
+    user = getattr(request.state, "current_user", None)
+    if user is not None:
         return user
-    except Exception as e:
-        # logger.error(f"Error getting current user: {e}")
-        raise HTTPException(status_code=401, detail="Invalid token")
+
+    payload = getattr(request.state, "user", None)
+    if payload is None:
+        token   = get_token_from_request(request)
+        payload = get_token_payload(token) if token else None
+
+    user = await find_active_user_async(payload, db)
+    request.state.current_user = user
+    return user
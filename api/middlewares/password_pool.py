@@ -0,0 +1,48 @@
+import os, asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# bcrypt releases the GIL so threads scale across cores, "process" isolates the work completely
+PASSWORD_HASH_POOL        = os.getenv('PASSWORD_HASH_POOL', 'thread')
+PASSWORD_HASH_WORKERS     = int(os.getenv('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', PASSWORD_HASH_WORKERS * 8))
+
+
+class PasswordPoolFull(Exception):
+    pass
+
+
+# Bounded pool for bcrypt work, callers beyond max_pending are turned away instead of queueing
+class PasswordPool:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING, kind: str = PASSWORD_HASH_POOL):
+        self.workers     = workers
+        self.max_pending = max_pending
+        self.kind        = kind
+        self.pending     = 0
+        self._executor   = None
+
+    def executor(self):
+        if self._executor is None:
+            executor_class = ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor
+            self._executor = executor_class(max_workers=self.workers)
+        return self._executor
+
+    # Only the event loop thread touches pending, so no lock is needed
+    async def run(self, func, *args):
+        if self.pending >= self.max_pending:
+            raise PasswordPoolFull()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor(), func, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_pool = PasswordPool()
@@ -0,0 +1,92 @@
+import os, json, time, asyncio, logging
+from threading import Lock
+
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_LIST_FILE          = os.getenv('REVOCATION_LIST_FILE', 'revoked_tokens.json')
+# Revocations within this window are written to the file together, off the event loop
+REVOCATION_SAVE_DELAY_SECONDS = float(os.getenv('REVOCATION_SAVE_DELAY_SECONDS', 1.0))
+
+
+# Revoked token ids with their exp claim, an entry is dropped once the token could not verify anyway
+class RevocationList:
+    def __init__(self, path: str = REVOCATION_LIST_FILE, save_delay: float = REVOCATION_SAVE_DELAY_SECONDS):
+        self.path          = path
+        self.save_delay    = save_delay
+        self._revoked      = {}
+        self._lock         = Lock()
+        self._write_lock   = Lock()
+        self._save_pending = False
+        self._save_timer   = None
+        self._save_future  = None
+
+    def is_revoked(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    def revoke(self, jti: str, exp: int) -> None:
+        if not jti:
+            return
+        with self._lock:
+            self._revoked[jti] = int(exp or time.time())
+            self._prune()
+            if self._save_pending:
+                return  # the scheduled write picks this entry up
+            self._save_pending = True
+        self._schedule_save()
+
+    def load(self) -> None:
+        try:
+            with open(self.path) as revoked_file:
+                revoked = json.load(revoked_file)
+        except FileNotFoundError:
+            revoked = {}
+        except ValueError:
+            logger.error(f"Revocation list {self.path} is not valid JSON, starting empty")
+            revoked = {}
+        with self._lock:
+            self._revoked = {jti: int(exp) for jti, exp in revoked.items()}
+            self._prune()
+
+    def _prune(self) -> None:
+        now = time.time()
+        for jti in [jti for jti, exp in self._revoked.items() if exp < now]:
+            del self._revoked[jti]
+
+    # Function to write pending revocations now and wait for the file, called on shutdown
+    async def flush(self) -> None:
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+            self._start_save(asyncio.get_running_loop())
+        if self._save_future is not None:
+            await self._save_future
+
+    def _schedule_save(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._save()  # no event loop to keep free, write right away
+            return
+        self._save_timer = loop.call_later(self.save_delay, self._start_save, loop)
+
+    def _start_save(self, loop) -> None:
+        self._save_timer  = None
+        self._save_future = loop.run_in_executor(None, self._save)
+
+    # Write to a temp file first so a crash never leaves a half written list, runs on a worker thread
+    def _save(self) -> None:
+        with self._lock:
+            if not self._save_pending:
+                return
+            self._save_pending = False
+            revoked = dict(self._revoked)
+        with self._write_lock:
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w") as revoked_file:
+                json.dump(revoked, revoked_file)
+            os.replace(temp_path, self.path)
+
+
+revocation_list = RevocationList()
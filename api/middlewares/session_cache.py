@@ -0,0 +1,27 @@
+import os
+from datetime import datetime
+from typing import Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from models.ttl_cache import TTLCache
+
+SESSION_CACHE_TTL_SECONDS = int(os.getenv('SESSION_CACHE_TTL_SECONDS', 300))
+SESSION_CACHE_MAX_SIZE    = int(os.getenv('SESSION_CACHE_MAX_SIZE', 10000))
+
+
+# LRU cache of active sessions keyed by the stored token hash (Session.token_hash), the raw JWT is never kept in memory
+# Every entry lives until the earlier of its TTL and the session expiry
+class SessionCache(TTLCache):
+    def __init__(self, max_size: int = SESSION_CACHE_MAX_SIZE, ttl_seconds: int = SESSION_CACHE_TTL_SECONDS):
+        super().__init__(max_size, ttl_seconds)
+
+    def get(self, session_token: str) -> Optional[datetime]:
+        return super().get(session_token)
+
+    def set(self, session_token: str, session_expiry: datetime) -> None:
+        super().set(session_token, session_expiry, (session_expiry - datetime.utcnow()).total_seconds())
+
+
+session_cache = SessionCache()
@@ -0,0 +1,13 @@
+import os
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from models.ttl_cache import TTLCache
+
+USER_CACHE_TTL_SECONDS = int(os.getenv('USER_CACHE_TTL_SECONDS', 60))
+USER_CACHE_MAX_SIZE    = int(os.getenv('USER_CACHE_MAX_SIZE', 10000))
+
+
+# Short lived LRU of active Users rows by user_id, the TTL bounds how long a disabled user stays cached
+user_cache = TTLCache(max_size=USER_CACHE_MAX_SIZE, ttl_seconds=USER_CACHE_TTL_SECONDS)
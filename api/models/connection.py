@@ -1,9 +1,18 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool, AsyncAdaptedQueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from starlette.requests import Request
 
+from models.pool_metrics import track_pool
+from models.request_metrics import track_queries
 
-import os
+
+import os, time, itertools
+from threading import Lock
+from collections import OrderedDict
 from urllib.parse import quote
 from dotenv import load_dotenv
 load_dotenv()
@@ -15,24 +24,127 @@ DB_NAME=os.getenv('DB_NAME')
 DB_USER=os.getenv('DB_USER')
 DB_PORT=os.getenv('DB_PORT')
 DB_URL = f'sqlite:///./{DB_NAME}.db'
+ASYNC_DB_URL = os.getenv('ASYNC_DB_URL', f'sqlite+aiosqlite:///./{DB_NAME}.db')
+
+DB_POOL_SIZE    = os.getenv('DB_POOL_SIZE')
+DB_MAX_OVERFLOW = os.getenv('DB_MAX_OVERFLOW')
+
+# Read only replicas as comma separated async urls, a user who just wrote keeps reading the primary for a short window
+REPLICA_DB_URLS          = [url.strip() for url in os.getenv('REPLICA_DB_URLS', '').split(',') if url.strip()]
+READ_YOUR_WRITES_SECONDS = float(os.getenv('READ_YOUR_WRITES_SECONDS', 5))
+
+SQLITE_JOURNAL_MODE    = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS     = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_MMAP_SIZE       = int(os.getenv('SQLITE_MMAP_SIZE', 268435456))
+
+
+# Pool settings per backend, a file based SQLite gains nothing from dozens of connections or pre-ping
+def engine_options(url: str) -> dict:
+    url = make_url(url)
+    if url.get_backend_name() != 'sqlite':
+        return {
+            "pool_pre_ping": True,
+            "pool_recycle" : 3600,
+            "pool_size"    : int(DB_POOL_SIZE or 20),
+            "max_overflow" : int(DB_MAX_OVERFLOW or 50),
+        }
+    if url.database in (None, '', ':memory:'):
+        return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+
+    options = {
+        "pool_size"   : int(DB_POOL_SIZE or 5),
+        "max_overflow": int(DB_MAX_OVERFLOW or 5),
+    }
+    # aiosqlite defaults to NullPool, which opens a connection and its thread for every session
+    if url.get_dialect().is_async:
+        options["poolclass"] = AsyncAdaptedQueuePool
+    return options
 
 
-engine = create_engine(
-    DB_URL,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    pool_size=20,       # Increase the pool size
-    max_overflow=50)    # Increase the max overflow
+engine = create_engine(DB_URL, **engine_options(DB_URL))
 
 SessionMaker = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine used by the async route handlers, any async driver url works here (aiosqlite, asyncpg)
+async_engine = create_async_engine(ASYNC_DB_URL, **engine_options(ASYNC_DB_URL))
+
+replica_engines = [create_async_engine(url, **engine_options(url)) for url in REPLICA_DB_URLS]
+
+track_pool("sync", engine)
+track_pool("async", async_engine.sync_engine)
+track_queries("sync", engine)
+track_queries("async", async_engine.sync_engine)
+for replica_index, replica_engine in enumerate(replica_engines):
+    track_pool(f"replica_{replica_index}", replica_engine.sync_engine)
+    track_queries(f"replica_{replica_index}", replica_engine.sync_engine)
+
+
+# WAL lets readers run next to the single writer, busy_timeout waits for the lock instead of failing with "database is locked"
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+
+for sqlite_engine in (engine, async_engine.sync_engine, *[replica.sync_engine for replica in replica_engines]):
+    if sqlite_engine.dialect.name == 'sqlite':
+        event.listen(sqlite_engine, "connect", set_sqlite_pragmas)
+
+AsyncSessionMaker = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+ReplicaSessionMakers = [async_sessionmaker(bind=replica, autoflush=False, expire_on_commit=False) for replica in replica_engines]
+_replica_cycle = itertools.cycle(ReplicaSessionMakers)
+
 Base = declarative_base()
 Base.metadata.create_all(bind=engine)
 
 
-def get_db():
-    db = SessionMaker()
-    try:
+# The request scoped session opened by DBSessionMiddleware, or a session of its own outside a request
+async def get_async_db(request: Request = None):
+    db = getattr(request.state, "db", None) if request is not None else None
+    if db is not None:
+        yield db
+        return
+    async with AsyncSessionMaker() as db:
+        yield db
+
+
+_recent_writers = OrderedDict()
+_recent_writers_lock = Lock()
+
+
+# Function to remember that a user just wrote, so their reads stay on the primary for READ_YOUR_WRITES_SECONDS
+def mark_user_write(user_id) -> None:
+    if not ReplicaSessionMakers or user_id is None:
+        return
+    now = time.monotonic()
+    with _recent_writers_lock:
+        _recent_writers[user_id] = now
+        _recent_writers.move_to_end(user_id)
+        while _recent_writers and next(iter(_recent_writers.values())) < now - READ_YOUR_WRITES_SECONDS:
+            _recent_writers.popitem(last=False)
+
+
+def replica_session_maker(user_id=None):
+    if not ReplicaSessionMakers:
+        return None
+    with _recent_writers_lock:
+        last_write = _recent_writers.get(user_id)
+    if last_write is not None and last_write > time.monotonic() - READ_YOUR_WRITES_SECONDS:
+        return None
+    return next(_replica_cycle)
+
+
+# Session for read only handlers, a replica when one is configured, otherwise the request session on the primary
+async def get_read_db(request: Request = None):
+    payload = getattr(request.state, "user", None) if request is not None else None
+    session_maker = replica_session_maker(payload.get("user_id") if payload else None)
+    if session_maker is None:
+        async for db in get_async_db(request):
+            yield db
+        return
+    async with session_maker() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -0,0 +1,79 @@
+import time, logging
+from threading import Lock
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+LONG_CHECKOUT_SECONDS = 30
+
+
+# Checkout counters for one engine pool, a growing checked_out with no traffic means a leaked session
+class PoolMetrics:
+    def __init__(self, name: str, pool):
+        self.name          = name
+        self.pool          = pool
+        self.checkouts     = 0
+        self.checkins      = 0
+        self.max_checked_out = 0
+        self._checked_out  = {}
+        self._lock         = Lock()
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self._checked_out[id(connection_record)] = time.monotonic()
+            self.max_checked_out = max(self.max_checked_out, len(self._checked_out))
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+            self._checked_out.pop(id(connection_record), None)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            ages = [now - started for started in self._checked_out.values()]
+        size     = self.pool.size() if hasattr(self.pool, "size") else None
+        overflow = self.pool.overflow() if hasattr(self.pool, "overflow") else None
+        oldest   = max(ages) if ages else 0.0
+        if oldest > LONG_CHECKOUT_SECONDS:
+            logger.warning(f"{self.name} pool has a connection checked out for {oldest:.0f}s, possible session leak")
+        return {
+            "pool"                    : self.name,
+            "pool_class"              : type(self.pool).__name__,
+            "size"                    : size,
+            "checked_out"             : len(ages),
+            "overflow"                : overflow,
+            "max_checked_out"         : self.max_checked_out,
+            "checkouts_total"         : self.checkouts,
+            "checkins_total"          : self.checkins,
+            "oldest_checkout_seconds" : round(oldest, 3),
+        }
+
+
+tracked_pools = []
+
+
+def track_pool(name: str, engine) -> PoolMetrics:
+    metrics = PoolMetrics(name, engine.pool)
+    event.listen(engine, "checkout", metrics.on_checkout)
+    event.listen(engine, "checkin", metrics.on_checkin)
+    tracked_pools.append(metrics)
+    return metrics
+
+
+def pool_metrics() -> list:
+    return [metrics.snapshot() for metrics in tracked_pools]
+
+
+# Function to render the pool snapshots as Prometheus gauges
+def pool_metric_lines() -> list:
+    snapshots = pool_metrics()
+    lines     = []
+    for field in ("size", "checked_out", "overflow", "max_checked_out", "checkouts_total", "checkins_total", "oldest_checkout_seconds"):
+        lines.append(f"# TYPE taskify_db_pool_{field} gauge")
+        for snapshot in snapshots:
+            if snapshot[field] is not None:
+                lines.append(f'taskify_db_pool_{field}{{pool="{snapshot["pool"]}"}} {snapshot[field]}')
+    return lines
@@ -0,0 +1,144 @@
+import os, time, logging
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+
+from sqlalchemy import event
+
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS   = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS   = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Route and query totals of the request being handled, None for queries outside a request
+current_request_stats = ContextVar("current_request_stats", default=None)
+
+
+# Query counters of one request, mutated by the engine events and read by the metrics middleware
+class RequestStats:
+    __slots__ = ("path", "query_count", "query_seconds")
+
+    def __init__(self, path: str):
+        self.path          = path
+        self.query_count   = 0
+        self.query_seconds = 0.0
+
+
+# Cumulative histogram per label set in the Prometheus layout, one lock for all label sets
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets, label_names):
+        self.name        = name
+        self.help_text   = help_text
+        self.buckets     = tuple(buckets)
+        self.label_names = tuple(label_names)
+        self._series     = {}
+        self._lock       = Lock()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(series):
+            label_text = format_labels(self.label_names, labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names):
+        self.name        = name
+        self.help_text   = help_text
+        self.label_names = tuple(label_names)
+        self._series     = {}
+        self._lock       = Lock()
+
+    def inc(self, labels: tuple, amount: float = 1) -> None:
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for labels, value in series:
+            lines.append(f"{self.name}{{{format_labels(self.label_names, labels)}}} {value}")
+        return lines
+
+
+def format_labels(label_names, labels) -> str:
+    return ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(label_names, labels))
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+request_duration = Histogram("taskify_http_request_duration_seconds", "Request latency by route.", LATENCY_BUCKETS, ("method", "route", "status"))
+request_queries  = Histogram("taskify_http_request_db_queries", "SQL statements run per request.", COUNT_BUCKETS, ("method", "route"))
+request_db_time  = Histogram("taskify_http_request_db_seconds", "Time spent in SQL per request.", LATENCY_BUCKETS, ("method", "route"))
+query_duration   = Histogram("taskify_db_query_duration_seconds", "SQL statement latency by originating path.", QUERY_BUCKETS, ("engine", "path"))
+slow_queries     = Counter("taskify_db_slow_queries_total", f"SQL statements slower than {SLOW_QUERY_MS:g}ms.", ("engine", "path"))
+
+
+# Function to record a finished request, the route template keeps the label set bounded
+def observe_request(method: str, route: str, status_code: int, seconds: float, stats: RequestStats) -> None:
+    request_duration.observe((method, route, str(status_code)), seconds)
+    request_queries.observe((method, route), stats.query_count)
+    request_db_time.observe((method, route), stats.query_seconds)
+
+
+def track_queries(name: str, engine) -> None:
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_started"].pop()
+        stats   = current_request_stats.get()
+        path    = stats.path if stats is not None else "<background>"
+        if stats is not None:
+            stats.query_count   += 1
+            stats.query_seconds += seconds
+        query_duration.observe((name, path), seconds)
+        if seconds * 1000 >= SLOW_QUERY_MS:
+            slow_queries.inc((name, path))
+            logger.warning(f"Slow query on {path} took {seconds * 1000:.1f}ms: {' '.join(statement.split())[:500]}")
+
+    # A failed statement never reaches after_cursor_execute, so its start time is dropped here
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+
+def render_metrics(extra_lines=()) -> str:
+    lines = []
+    for metric in (request_duration, request_queries, request_db_time, query_duration, slow_queries):
+        lines.extend(metric.render())
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,88 @@
+import os, asyncio, logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, delete
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from models.connection import AsyncSessionMaker
+from models.users import Session
+
+logger = logging.getLogger(__name__)
+
+SESSION_SWEEPER_ENABLED        = os.getenv('SESSION_SWEEPER_ENABLED', '1') == '1'
+SESSION_SWEEP_INTERVAL_SECONDS = int(os.getenv('SESSION_SWEEP_INTERVAL_SECONDS', 300))
+SESSION_SWEEP_BATCH_SIZE       = int(os.getenv('SESSION_SWEEP_BATCH_SIZE', 500))
+SESSION_RETENTION_DAYS         = int(os.getenv('SESSION_RETENTION_DAYS', 7))
+
+
+# Background task that marks expired sessions and purges old ones, one short transaction per batch
+class SessionSweeper:
+    def __init__(self, interval_seconds: int = SESSION_SWEEP_INTERVAL_SECONDS, batch_size: int = SESSION_SWEEP_BATCH_SIZE, retention_days: int = SESSION_RETENTION_DAYS):
+        self.interval_seconds = interval_seconds
+        self.batch_size       = batch_size
+        self.retention_days   = retention_days
+        self._worker          = None
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.running:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+
+    async def _run(self):
+        while True:
+            try:
+                expired, purged = await self.sweep()
+                if expired or purged:
+                    logger.info(f"Session sweep expired {expired} and purged {purged} sessions")
+            except Exception as exc:
+                logger.error(f"Session sweep failed: {exc}", exc_info=True)
+            await asyncio.sleep(self.interval_seconds)
+
+    # Function to run one full sweep, returns how many sessions were expired and purged
+    async def sweep(self):
+        now     = datetime.utcnow()
+        expired = await self._in_batches(
+            select(Session.session_id).filter(Session.session_expiry < now, Session.is_deleted == 0),
+            lambda session_ids: update(Session).where(Session.session_id.in_(session_ids)).values(
+                session_status = False,
+                is_deleted     = True,
+                updated_at     = now,
+            ),
+        )
+        # Missing rows read as expired, so deleting a session after the retention window never lets a token back in
+        purged = await self._in_batches(
+            select(Session.session_id).filter(Session.session_expiry < now - timedelta(days=self.retention_days)),
+            lambda session_ids: delete(Session).where(Session.session_id.in_(session_ids)),
+        )
+        return expired, purged
+
+    async def _in_batches(self, id_query, statement_for):
+        total = 0
+        while True:
+            async with AsyncSessionMaker() as db:
+                session_ids = (await db.execute(id_query.order_by(Session.session_expiry).limit(self.batch_size))).scalars().all()
+                if not session_ids:
+                    return total
+                await db.execute(statement_for(session_ids))
+                await db.commit()
+            total += len(session_ids)
+            if len(session_ids) < self.batch_size:
+                return total
+            await asyncio.sleep(0)  # let request handlers in between batches
+
+
+session_sweeper = SessionSweeper()
@@ -0,0 +1,32 @@
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from models.ttl_cache import TTLCache
+
+TASK_COUNT_CACHE_TTL_SECONDS = int(os.getenv('TASK_COUNT_CACHE_TTL_SECONDS', 30))
+TASK_COUNT_CACHE_MAX_SIZE    = int(os.getenv('TASK_COUNT_CACHE_MAX_SIZE', 10000))
+
+
+# LRU cache of task-list totals keyed by user and filter, the TTL bounds staleness from other workers
+class TaskCountCache(TTLCache):
+    def __init__(self, max_size: int = TASK_COUNT_CACHE_MAX_SIZE, ttl_seconds: int = TASK_COUNT_CACHE_TTL_SECONDS):
+        super().__init__(max_size, ttl_seconds)
+
+    def get(self, user_id, status_filter=None, search=None) -> Optional[int]:
+        return super().get((user_id, status_filter or None, search or None))
+
+    def set(self, user_id, status_filter, search, task_count: int) -> None:
+        super().set((user_id, status_filter or None, search or None), task_count)
+
+    # Drop every count of one user, or all counts when no user is given
+    def invalidate(self, user_id=None) -> None:
+        if user_id is None:
+            self.clear()
+            return
+        self.invalidate_where(lambda key: key[0] == user_id)
+
+
+task_count_cache = TaskCountCache()
@@ -0,0 +1,67 @@
+import os, asyncio, itertools
+from typing import Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+TASK_EVENTS_QUEUE_SIZE        = int(os.getenv('TASK_EVENTS_QUEUE_SIZE', 100))
+TASK_EVENTS_HEARTBEAT_SECONDS = float(os.getenv('TASK_EVENTS_HEARTBEAT_SECONDS', 15))
+# A stream ends after this long and the client reconnects, so logouts apply and a graceful shutdown is never held open
+TASK_EVENTS_MAX_SECONDS       = float(os.getenv('TASK_EVENTS_MAX_SECONDS', 300))
+# Lifetime of the ?token= a browser opens the stream with, it is only checked when the stream connects
+TASK_EVENTS_TOKEN_SECONDS     = int(os.getenv('TASK_EVENTS_TOKEN_SECONDS', 60))
+
+TASK_CREATED        = "task.created"
+TASK_UPDATED        = "task.updated"
+TASK_STATUS_CHANGED = "task.status_changed"
+TASK_REMOVED        = "task.removed"
+TASK_RESYNC         = "task.resync"
+
+
+# In-process fan-out of task changes, every subscriber owns a bounded queue so one slow client never holds up a write
+class TaskEventHub:
+    def __init__(self, queue_size: int = TASK_EVENTS_QUEUE_SIZE):
+        self.queue_size   = queue_size
+        self._subscribers = {}
+        self._event_ids   = itertools.count(1)
+
+    def subscribe(self, user_id) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[user_id]
+
+    # Publish one event to every stream of the user, a full queue is emptied and told to refetch instead
+    def publish(self, user_id, event: str, data: Optional[dict] = None) -> None:
+        queues = self._subscribers.get(user_id)
+        if not queues:
+            return
+        message = {"id": next(self._event_ids), "event": event, "data": data or {}}
+        for queue in list(queues):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"id": message["id"], "event": TASK_RESYNC, "data": {}})
+
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    # Wake every open stream with None so it finishes and the server can shut down
+    def close(self) -> None:
+        for queues in list(self._subscribers.values()):
+            for queue in list(queues):
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+
+task_event_hub = TaskEventHub()
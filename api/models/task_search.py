@@ -0,0 +1,63 @@
+import os, re
+
+from sqlalchemy import select, text, table, column
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# "fts5" uses the tasks_fts index built by the migration, "like" keeps the old ilike scan
+TASK_SEARCH_BACKEND = os.getenv('TASK_SEARCH_BACKEND', 'fts5')
+
+tasks_fts = table('tasks_fts', column('rowid'), column('rank'))
+
+_fts_available = None
+
+
+# Function to check once per process whether the full-text index can be used
+async def fts_enabled(db: AsyncSession) -> bool:
+    global _fts_available
+    if TASK_SEARCH_BACKEND != 'fts5':
+        return False
+    if _fts_available is None:
+        if db.bind.dialect.name != 'sqlite':
+            _fts_available = False
+        else:
+            # An index from before the owner column would match every user's tasks, it falls back to the like scan until migrated
+            found = await db.scalar(text("SELECT count(*) FROM pragma_table_info('tasks_fts') WHERE name='task_owner'"))
+            _fts_available = bool(found)
+    return _fts_available
+
+
+# Function to turn user input into an FTS5 query, every term must match and is prefix matched
+# The owner token narrows the match to the tasks of the user, so the cost follows that user's matches and not everyone's
+# A prefix term still expands against the whole index before the owner narrows it, exact terms never do
+def build_match_query(search: str, user_id):
+    terms = re.findall(r"\w+", search or "")
+    if not terms:
+        return None
+    return f'task_owner : "{owner_token(user_id)}" AND {{task_title task_description}} : (' + " ".join(f'"{term}"*' for term in terms) + ')'
+
+
+# Function to build the token the FTS row of a task carries for its owner, the migration writes the same 'u' || task_user_id
+def owner_token(user_id) -> str:
+    return f"u{int(user_id)}"
+
+
+# Matching task ids with their bm25 rank, lower rank is a better match
+def ranked_matches(match_query: str):
+    return (
+        select(tasks_fts.c.rowid.label("task_id"), tasks_fts.c.rank.label("rank"))
+        .select_from(tasks_fts)
+        .where(text("tasks_fts MATCH :match_query").bindparams(match_query=match_query))
+        .subquery()
+    )
+
+
+# Matching task ids without the rank, used as an IN list so the planner runs the MATCH once instead of once per task
+def matching_ids(match_query: str):
+    return (
+        select(tasks_fts.c.rowid)
+        .select_from(tasks_fts)
+        .where(text("tasks_fts MATCH :match_query").bindparams(match_query=match_query))
+    )
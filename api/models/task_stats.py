@@ -0,0 +1,84 @@
+from collections import Counter
+from datetime import timedelta
+from sqlalchemy import Column, Date, ForeignKey, Integer, String, Index, select, update, insert, delete, func, case
+from models.connection import Base
+from sqlalchemy.orm import Session as DBSession
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# Live task counts per user, status and due date, kept in step by every task write in the same transaction
+# A user has one row per status and distinct due date, so the stats read never touches the tasks table
+class TaskStats(Base):
+    __tablename__ = 'task_stats'
+
+    task_stats_id       = Column(Integer, primary_key=True)
+    task_user_id        = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    task_status         = Column(String(255), nullable=False)
+    task_due_date       = Column(Date, nullable=True)
+    task_count          = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_task_stats_user_key", "task_user_id", "task_status", "task_due_date", unique=True),
+    )
+
+
+    # Function to build the counter key of a task, the status is stored as text and a missing one is pending like the column default
+    def key(task_status, task_due_date):
+        return ("0" if task_status is None else str(task_status), task_due_date)
+
+    # Function to apply counter changes of one user, deltas maps (task_status, task_due_date) to the change in count
+    async def apply_async(db: AsyncSession, user_id, deltas: Counter):
+        emptied = False
+        for (task_status, task_due_date), delta in deltas.items():
+            if delta == 0:
+                continue
+            filters = [
+                TaskStats.task_user_id == user_id,
+                TaskStats.task_status == task_status,
+                TaskStats.task_due_date.is_(None) if task_due_date is None else TaskStats.task_due_date == task_due_date,
+            ]
+            result = await db.execute(update(TaskStats).where(*filters).values(task_count=TaskStats.task_count + delta))
+            if result.rowcount == 0 and delta > 0:
+                await db.execute(insert(TaskStats).values(task_user_id=user_id, task_status=task_status, task_due_date=task_due_date, task_count=delta))
+            emptied = emptied or delta < 0
+
+        # Keys that dropped to zero are removed, so the table only grows with the due dates still in use
+        if emptied:
+            await db.execute(delete(TaskStats).where(TaskStats.task_user_id == user_id, TaskStats.task_count <= 0))
+
+    # Per status totals with the due date buckets, summed from the counter rows of the user
+    async def summary_async(db: AsyncSession, user_id, today):
+        week_end = today + timedelta(days=6 - today.weekday())
+        due_date = TaskStats.task_due_date
+        result = await db.execute(
+            select(
+                TaskStats.task_status,
+                func.sum(TaskStats.task_count).label("total"),
+                func.sum(case((due_date < today, TaskStats.task_count), else_=0)).label("overdue"),
+                func.sum(case((due_date == today, TaskStats.task_count), else_=0)).label("due_today"),
+                func.sum(case((due_date.between(today, week_end), TaskStats.task_count), else_=0)).label("due_this_week"),
+                func.sum(case((due_date.is_(None), TaskStats.task_count), else_=0)).label("no_due_date"),
+            )
+            .filter(TaskStats.task_user_id == user_id)
+            .group_by(TaskStats.task_status)
+        )
+        return week_end, result.all()
+
+    # Function to recount the counters from the live tasks, for all users or one, used after seeding or to repair drift
+    def rebuild(db: DBSession, user_id=None):
+        from models.tasks import Tasks
+
+        task_filters  = [Tasks.deleted_at.is_(None), Tasks.task_user_id.isnot(None)]
+        stats_filters = []
+        if user_id is not None:
+            task_filters.append(Tasks.task_user_id == user_id)
+            stats_filters.append(TaskStats.task_user_id == user_id)
+
+        db.execute(delete(TaskStats).where(*stats_filters))
+        db.execute(insert(TaskStats).from_select(
+            ["task_user_id", "task_status", "task_due_date", "task_count"],
+            select(Tasks.task_user_id, func.coalesce(Tasks.task_status, "0"), Tasks.task_due_date, func.count(Tasks.task_id))
+            .filter(*task_filters)
+            .group_by(Tasks.task_user_id, func.coalesce(Tasks.task_status, "0"), Tasks.task_due_date)
+        ))
+        db.commit()
@@ -0,0 +1,38 @@
+import hashlib
+from threading import Lock
+
+
+# Write counters behind the task-list ETags, bumped by every task write of this process
+class TaskVersions:
+    def __init__(self):
+        self._global = 0
+        self._users  = {}
+        self._lock   = Lock()
+
+    def get(self, user_id) -> str:
+        with self._lock:
+            return f"{self._global}.{self._users.get(user_id, 0)}"
+
+    # Bump one user, or every user when no user is given
+    def bump(self, user_id=None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._global += 1
+            else:
+                self._users[user_id] = self._users.get(user_id, 0) + 1
+
+
+task_versions = TaskVersions()
+
+
+# Weak ETag over the version parts and the request filters
+def build_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or etag.removeprefix("W/") in candidates
@@ -1,7 +1,17 @@
+import os
 from datetime import datetime
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, Text, Date, String, desc, or_
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, Text, Date, String, Index, desc, or_, select, update, func, text
 from models.connection import Base
-from sqlalchemy.orm import relationship, Session as DBSession
+from sqlalchemy.orm import relationship
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import task_search
+from models.task_count_cache import task_count_cache
+
+from dotenv import load_dotenv
+load_dotenv()
+
+TASK_PAGE_SIZE     = int(os.getenv('TASK_PAGE_SIZE', 15))
+TASK_MAX_PAGE_SIZE = int(os.getenv('TASK_MAX_PAGE_SIZE', 100))
 
 class Tasks(Base):
     __tablename__ = 'tasks'
@@ -18,55 +28,153 @@ class Tasks(Base):
 
     user_tasks          = relationship("Users", back_populates="tasks")
 
+    # Partial indexes only cover live rows, every hot query filters on deleted_at IS NULL
+    # Every query is scoped to one owner, ix_tasks_user_live serves the list, count and lookups of that user
+    # and the status filter and title checks get their own owner-first index, benchmarks/query_plans.py checks the plans
+    # A live title is unique per user, the index also stops duplicates from adds that pass the title check at the same time
+    __table_args__ = (
+        Index("ix_tasks_user_live", "task_user_id", "deleted_at", "task_id"),
+        Index("ix_tasks_user_status_live", "task_user_id", "task_status", "task_id", sqlite_where=text("deleted_at IS NULL"), postgresql_where=text("deleted_at IS NULL")),
+        Index("ix_tasks_user_title_live", "task_user_id", "task_title", unique=True, sqlite_where=text("deleted_at IS NULL"), postgresql_where=text("deleted_at IS NULL")),
+        Index("ix_tasks_user_updated_at", "task_user_id", "updated_at"),
+    )
 
-    def check_record(db: DBSession, task_title):
-        if task_title:
-            task = db.query(Tasks).filter(Tasks.task_title==task_title, Tasks.deleted_at.is_(None)).first()
-            return task
-        else:
-            return None
 
-    def find_task_by_task_id(db:DBSession, task_id):
-        if task_id:
-            task = db.query(Tasks).filter(Tasks.task_id==task_id, Tasks.deleted_at.is_(None)).first()
-            return task
-        else:
-            return None
-
-    def all_tasks(db: DBSession, status_filter=None, search=None, skip=1):
-
-        offset = 0
-        limit = 15
-        offset = (int(skip) - 1) * limit
+    def list_filters(user_id, status_filter=None, search=None):
+        filters = [Tasks.task_user_id == user_id, Tasks.deleted_at.is_(None)]
 
-        query = db.query(Tasks).filter(Tasks.deleted_at.is_(None))
+        if status_filter:
+            filters.append(Tasks.task_status == status_filter)
 
-        if status_filter and not search:
-            query = query.filter(Tasks.task_status == status_filter)
-
-        elif search and not status_filter:
-            query = query.filter(
+        if search:
+            filters.append(
                 or_(
                     Tasks.task_title.ilike(f"%{search}%"),
                     Tasks.task_description.ilike(f"%{search}%")
                 )
             )
 
-        elif status_filter and search:
-            query = query.filter(
-                Tasks.task_status == status_filter,
-                or_(
-                    Tasks.task_title.ilike(f"%{search}%"),
-                    Tasks.task_description.ilike(f"%{search}%")
-                )
-            )
+        return filters
 
-        else:
-            query = query
+    # Lookups of the task routes, all of them run on the async session
+    async def existing_titles_async(db: AsyncSession, user_id, task_titles):
+        if not task_titles:
+            return set()
+        result = await db.execute(select(Tasks.task_title).filter(Tasks.task_user_id == user_id, Tasks.task_title.in_(task_titles), Tasks.deleted_at.is_(None)))
+        return set(result.scalars().all())
 
-        tasks      = query.order_by(desc(Tasks.task_id)).offset(offset).limit(limit)
-        task_count = query.count()
+    # Live tasks among task_ids with their current status and due date, the bulk status update moves their stats counters
+    async def existing_task_keys_async(db: AsyncSession, user_id, task_ids):
+        if not task_ids:
+            return {}
+        result = await db.execute(select(Tasks.task_id, Tasks.task_status, Tasks.task_due_date).filter(Tasks.task_user_id == user_id, Tasks.task_id.in_(task_ids), Tasks.deleted_at.is_(None)))
+        return {task_id: (task_status, task_due_date) for task_id, task_status, task_due_date in result.all()}
 
-        return limit, tasks, task_count
+    # Every task write sets updated_at, so its maximum changes whenever a task of the user changes, read from ix_tasks_user_updated_at
+    async def last_updated_async(db: AsyncSession, user_id):
+        return await db.scalar(select(func.max(Tasks.updated_at)).filter(Tasks.task_user_id == user_id))
 
+    async def check_record_async(db: AsyncSession, user_id, task_title):
+        if task_title:
+            result = await db.execute(select(Tasks).filter(Tasks.task_user_id==user_id, Tasks.task_title==task_title, Tasks.deleted_at.is_(None)).limit(1))
+            return result.scalars().first()
+        else:
+            return None
 
+    async def find_task_by_task_id_async(db: AsyncSession, user_id, task_id):
+        if task_id:
+            result = await db.execute(select(Tasks).filter(Tasks.task_user_id==user_id, Tasks.task_id==task_id, Tasks.deleted_at.is_(None)).limit(1))
+            return result.scalars().first()
+        else:
+            return None
+
+    # Function to change a live task only while it still has the status and due date it was read with
+    # The stats counters are moved by the state that was read, returns False when another request changed or removed the task first
+    async def update_if_unchanged_async(db: AsyncSession, user_id, task_id, task_status, task_due_date, values: dict):
+        result = await db.execute(
+            update(Tasks)
+            .where(
+                Tasks.task_id == task_id,
+                Tasks.task_user_id == user_id,
+                Tasks.deleted_at.is_(None),
+                Tasks.task_status.is_not_distinct_from(task_status),
+                Tasks.task_due_date.is_not_distinct_from(task_due_date),
+            )
+            .values(values)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    # Filtered task query shared by the list and the export, ranked is set when full-text search is used
+    async def filtered_query_async(db: AsyncSession, user_id, status_filter=None, search=None):
+        match_query = task_search.build_match_query(search, user_id) if search and await task_search.fts_enabled(db) else None
+
+        if match_query:
+            # The matches go in as an IN list, a join lets the planner probe the FTS index once per task of the user
+            # The MATCH itself is scoped by the owner token, see task_search.build_match_query
+            filters = Tasks.list_filters(user_id, status_filter) + [Tasks.task_id.in_(task_search.matching_ids(match_query))]
+            query   = select(Tasks).filter(*filters)
+            count_query = select(func.count(Tasks.task_id)).filter(*filters)
+            return query, count_query, task_search.ranked_matches(match_query)
+
+        filters = Tasks.list_filters(user_id, status_filter, search)
+        query   = select(Tasks).filter(*filters)
+        count_query = select(func.count(Tasks.task_id)).filter(*filters)
+        return query, count_query, None
+
+    # Function to clamp the requested page size, anything missing or invalid falls back to TASK_PAGE_SIZE
+    def page_size(per_page=None) -> int:
+        try:
+            per_page = int(per_page)
+        except (TypeError, ValueError):
+            return TASK_PAGE_SIZE
+        return max(1, min(per_page, TASK_MAX_PAGE_SIZE))
+
+    # Columns the list and the export actually send, rows come back as plain tuples outside the identity map
+    def list_columns():
+        return (Tasks.task_id, Tasks.task_title, Tasks.task_description, Tasks.task_due_date, Tasks.task_status)
+
+    async def all_tasks_async(db: AsyncSession, user_id, status_filter=None, search=None, skip=1, after_task_id=None, with_count=True, per_page=None):
+
+        limit = Tasks.page_size(per_page)
+        query, count_query, ranked = await Tasks.filtered_query_async(db, user_id, status_filter, search)
+        query = query.with_only_columns(*Tasks.list_columns())
+        match_query = ranked is not None
+
+        # Cursor mode walks the primary key range instead of skipping rows with OFFSET
+        if after_task_id:
+            query = query.filter(Tasks.task_id < int(after_task_id)).order_by(desc(Tasks.task_id))
+        elif match_query:
+            query = query.join(ranked, ranked.c.task_id == Tasks.task_id).order_by(ranked.c.rank, desc(Tasks.task_id)).offset((int(skip) - 1) * limit)
+        else:
+            query = query.order_by(desc(Tasks.task_id)).offset((int(skip) - 1) * limit)
+
+        # One extra row tells us whether a next page exists
+        result = await db.execute(query.limit(limit + 1))
+        tasks  = result.all()
+        has_more    = len(tasks) > limit
+        next_cursor = tasks[limit - 1].task_id if has_more else None
+        tasks  = tasks[:limit]
+
+        # The total is optional and served from the count cache when possible
+        task_count = None
+        if with_count:
+            task_count = task_count_cache.get(user_id, status_filter, search)
+            if task_count is None:
+                task_count = await db.scalar(count_query)
+                task_count_cache.set(user_id, status_filter, search, task_count)
+
+        # Ranked pages are not ordered by task_id, so a task_id cursor would skip rows
+        if match_query and not after_task_id:
+            next_cursor = None
+
+        return limit, tasks, task_count, next_cursor, has_more
+
+    # Stream plain rows with a server-side cursor, nothing is kept in the identity map
+    async def stream_tasks_async(db: AsyncSession, user_id, status_filter=None, search=None, batch_size=500):
+        query, _, _ = await Tasks.filtered_query_async(db, user_id, status_filter, search)
+        query = query.with_only_columns(*Tasks.list_columns()).order_by(desc(Tasks.task_id)).execution_options(yield_per=batch_size)
+
+        result = await db.stream(query)
+        async for row in result:
+            yield row
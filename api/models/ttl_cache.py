@@ -0,0 +1,55 @@
+import time
+from threading import Lock
+from collections import OrderedDict
+
+
+# Thread safe LRU where every entry also expires after its TTL, the callers only build keys and decide what to drop
+class TTLCache:
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size    = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries    = OrderedDict()
+        self._lock       = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl_seconds > 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, valid_until = entry
+            if valid_until <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    # ttl_seconds can only shorten the configured TTL, for values that expire on their own earlier
+    def set(self, key, value, ttl_seconds: float = None) -> None:
+        if not self.enabled:
+            return
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        if ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    # Function to drop every entry whose key matches, e.g. all entries of one user
+    def invalidate_where(self, matches) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if matches(key)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
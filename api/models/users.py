@@ -1,5 +1,6 @@
+import hashlib
 from datetime import datetime
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, String, Integer
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, String, Integer, Index, text
 from models.connection import Base
 from sqlalchemy.orm import relationship 
 
@@ -20,13 +21,17 @@ class Users(Base):
     user_session        = relationship("Session", back_populates="login_session")
     tasks               = relationship("Tasks", back_populates="user_tasks")
 
+    __table_args__ = (
+        Index("ix_users_user_email_live", "user_email", sqlite_where=text("deleted_at IS NULL"), postgresql_where=text("deleted_at IS NULL")),
+    )
+
 
 class Session(Base):
     __tablename__ = "user_session"
 
     session_id      = Column(Integer, primary_key=True, index=True)
     session_email   = Column(String(255))
-    session_token   = Column(String(955))
+    session_token   = Column(String(64), index=True, comment="sha256 hex digest of the JWT")
     session_user    = Column(Integer, ForeignKey("users.user_id"))
     session_expiry  = Column(DateTime, default=datetime.now())
     session_status  = Column(Boolean, default=1)
@@ -35,3 +40,12 @@ class Session(Base):
     updated_at      = Column(DateTime, nullable=True)
 
     login_session   = relationship("Users", back_populates="user_session")
+
+    # The sweeper walks sessions by expiry
+    __table_args__ = (
+        Index("ix_user_session_session_expiry", "session_expiry"),
+    )
+
+    # Function to turn a JWT into the fixed size value stored in session_token, the raw token is never written
+    def token_hash(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
@@ -0,0 +1,89 @@
+import os, asyncio, logging
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from models.connection import AsyncSessionMaker
+
+logger = logging.getLogger(__name__)
+
+WRITE_QUEUE_ENABLED   = os.getenv('WRITE_QUEUE_ENABLED', '0') == '1'
+WRITE_QUEUE_MAX_BATCH = int(os.getenv('WRITE_QUEUE_MAX_BATCH', 100))
+
+
+# Single writer for SQLite, concurrent write jobs are run on one session and committed as one transaction
+class WriteQueue:
+    def __init__(self, max_batch: int = WRITE_QUEUE_MAX_BATCH):
+        self.max_batch = max_batch
+        self._queue    = None
+        self._worker   = None
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._queue  = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.running:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+
+    # A job is an async function taking a session, it may add or change rows but must not commit
+    async def run(self, db, job):
+        if not self.running:
+            result = await job(db)
+            await db.commit()
+            return result
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((job, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            jobs = [await self._queue.get()]
+            while len(jobs) < self.max_batch and not self._queue.empty():
+                jobs.append(self._queue.get_nowait())
+            # A failing rollback or replay must not kill the worker, the waiting requests would never be answered
+            try:
+                await self._run_batch(jobs)
+            except Exception as exc:
+                logger.error(f"Write batch of {len(jobs)} could not be completed: {exc}", exc_info=True)
+                for _, future in jobs:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    async def _run_batch(self, jobs):
+        async with AsyncSessionMaker() as db:
+            try:
+                results = []
+                for job, _ in jobs:
+                    results.append(await job(db))
+                    await db.flush()  # later jobs in the batch see the rows of earlier ones
+                await db.commit()
+            except Exception as exc:
+                await db.rollback()
+                if len(jobs) == 1:
+                    if not jobs[0][1].done():
+                        jobs[0][1].set_exception(exc)
+                    return
+                # One bad job must not fail the others, replay them one transaction each
+                logger.warning(f"Write batch of {len(jobs)} failed, retrying jobs one by one: {exc}")
+                for job in jobs:
+                    await self._run_batch([job])
+                return
+
+        for (_, future), result in zip(jobs, results):
+            if not future.done():
+                future.set_result(result)
+
+
+write_queue = WriteQueue()
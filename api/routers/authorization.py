@@ -1,16 +1,20 @@
 from fastapi import APIRouter, Depends, Form, Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, root_validator
-from sqlalchemy.orm import Session as DBSession
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
  
 
+from uuid import uuid4
 from typing import Dict, Optional
 
 from jose import jwt
 
-from middlewares.middleware import ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, SECRET_KEY, verify_password
+from middlewares.middleware import ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, SECRET_KEY, verify_password_async, revoke_token
+from middlewares.password_pool import PasswordPoolFull
+from middlewares.session_cache import session_cache
 
-from models.connection import get_db
+from models.connection import get_async_db
 from models.users import Users,Session 
 from datetime import timedelta, datetime
  
@@ -40,8 +44,8 @@ class SignInSchema(BaseModel):
 
 # Login in to the portal
 @router.post('/sign-in', response_model=LoginResponse)
-def sign_in(
-    db           : DBSession = Depends(get_db),
+async def sign_in(
+    db           : AsyncSession = Depends(get_async_db),
     user_email   : Optional[str] = Form(None),
     user_password: Optional[str] = Form(None),
     ):
@@ -58,22 +62,31 @@ def sign_in(
             "message": simplified_errors
         }, status_code=422)
 
-    user = db.query(Users).filter(Users.user_email==user_email, Users.user_status==1, Users.deleted_at.is_(None)).first()
+    result = await db.execute(select(Users).filter(Users.user_email==user_email, Users.user_status==1, Users.deleted_at.is_(None)).limit(1))
+    user   = result.scalars().first()
     if not user:
         return JSONResponse({
             "status" : 500,
             "message": "Please enter valid email address."
         }, status_code=500)
 
-    # verify the password
-    if not verify_password(user_password, user.user_password):
+    # verify the password, bcrypt runs on the password pool so a login burst cannot starve other requests
+    try:
+        password_valid = await verify_password_async(user_password, user.user_password)
+    except PasswordPoolFull:
+        return JSONResponse({
+            "status" : 503,
+            "message": "Too many sign-in attempts right now, please try again."
+        }, status_code=503, headers={"Retry-After": "1"})
+
+    if not password_valid:
         return JSONResponse({ 
             "status" : 500,
             "message": "Invalid password."
         }, status_code=500)
 
     token        = create_access_token({"user_id": user.user_id, "user_email": user.user_email})
-    user_session = create_user_session(db, user, token)
+    user_session = await create_user_session(db, user, token)
 
     response_data = {
         "status"    : 200,
@@ -93,31 +106,30 @@ def sign_in(
 def create_access_token(data: Dict[str, str], expiry_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES) -> str:
     to_encode = data.copy()
     expire    = datetime.utcnow() + timedelta(minutes=expiry_minutes)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
 # Function to create a new user session
-def create_user_session(db: DBSession, user: Users, token: str, expiry_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES) -> Session:
+async def create_user_session(db: AsyncSession, user: Users, token: str, expiry_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES) -> Session:
     session_expiry = datetime.utcnow() + timedelta(minutes=expiry_minutes)
     new_session = Session(
         session_email   = user.user_email,
-        session_token   = token,
+        session_token   = Session.token_hash(token),
         session_user    = user.user_id,
         session_expiry  = session_expiry,
         session_status  = True,
     )
     db.add(new_session)
-    db.commit()
-    db.refresh(new_session)
+    await db.commit()
     return new_session
 
 
 
 
 @router.post("/logout")
-def logout(request: Request, db: DBSession = Depends(get_db)):
+async def logout(request: Request, db: AsyncSession = Depends(get_async_db)):
     authorization: str = request.headers.get("Authorization")
 
     if not authorization:
@@ -129,19 +141,22 @@ def logout(request: Request, db: DBSession = Depends(get_db)):
         return JSONResponse({"status" : 401, "message": "Invalid Authorization header format"}, status_code=401)
 
     token = token_parts[1]
+    session_cache.invalidate(Session.token_hash(token))
+    revoke_token(token)
 
-    session_record = db.query(Session).filter(
+    result = await db.execute(select(Session).filter(
         Session.is_deleted == 0,
         Session.session_status == 1,
-        Session.session_token == token
-    ).first()
+        Session.session_token == Session.token_hash(token)
+    ).limit(1))
+    session_record = result.scalars().first()
 
     if not session_record:
         return JSONResponse({"status" : 401, "message": "Session not found or already deleted"}, status_code=401)
 
     session_record.is_deleted = True
     session_record.session_status = 0
-    db.commit()
+    await db.commit()
 
     return JSONResponse({"status" : 401, "message": "Successfully logged out"}, status_code=401)
 
@@ -1,27 +1,104 @@
-import logging
-from logging.config import dictConfig
-
-LOGGING_CONFIG = {
-    "version": 1,
-    "disable_existing_loggers": False,
-    "formatters": {
-        "default": {
-            "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        },
-    },
-    "handlers": {
-        "file": {
-            "level": "INFO",
-            "class": "logging.FileHandler",
-            "formatter": "default",
-            "filename": "debug.log",
-        },
-    },
-    "root": {
-        "level": "INFO",
-        "handlers": ["file"],
-    },
-}
+import os, json, copy, queue, random, atexit, logging
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from dotenv import load_dotenv
+load_dotenv()
+
+LOG_LEVEL        = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FILE         = os.getenv('LOG_FILE', 'debug.log')
+LOG_MAX_BYTES    = int(os.getenv('LOG_MAX_BYTES', 10485760))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+LOG_QUEUE_SIZE   = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+# Share of requests whose INFO and DEBUG records are written, warnings and errors are always kept
+LOG_SAMPLE_RATE  = float(os.getenv('LOG_SAMPLE_RATE', 1.0))
+
+# Request id and sampling decision of the request being handled, None outside a request
+request_log_context = ContextVar("request_log_context", default=None)
+
+_listener = None
+
+
+# Function to bind the log context of a request, returns the token used to reset it
+def bind_request(request_id: str):
+    return request_log_context.set((request_id, random.random() < LOG_SAMPLE_RATE))
+
+
+# One JSON object per line, written by the listener thread
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time"   : datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level"  : record.levelname,
+            "logger" : record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+# Drops INFO and DEBUG records of requests that were not sampled
+class RequestSamplingFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = request_log_context.get()
+        if context is None:
+            return True
+        record.request_id = context[0]
+        return context[1] or record.levelno >= logging.WARNING
+
+
+# Hands records to the listener thread without blocking, a full queue drops the record instead of stalling a request
+class BufferedQueueHandler(QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    # Only the message and traceback text travel to the listener, formatting to JSON happens off the event loop
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg  = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
 
 def setup_logging():
-    dictConfig(LOGGING_CONFIG)
\ No newline at end of file
+    global _listener
+    if _listener is not None:
+        return
+
+    file_handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True)
+    file_handler.setFormatter(JsonFormatter())
+
+    queue_handler = BufferedQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    queue_handler.addFilter(RequestSamplingFilter())
+
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.handlers = [queue_handler]
+
+    _listener = QueueListener(queue_handler.queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+# Function to flush the queued records and stop the listener thread
+def shutdown_logging():
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
@@ -1,18 +1,31 @@
-from datetime import datetime
-from typing import Optional
-
-from pydantic import BaseModel, root_validator
-from middlewares.middleware import get_current_user
-from models.connection import get_db
-from fastapi.responses import JSONResponse
-from fastapi import APIRouter, Depends, Form, Request
-from sqlalchemy.orm import Session as DBSession
+import os, io, csv, json, time, asyncio
+import orjson
+from collections import Counter
+from datetime import datetime, date
+from typing import List, Optional, Union
+
+from pydantic import BaseModel, ConfigDict, computed_field, root_validator
+from middlewares.middleware import get_request_user, get_token_from_request, create_stream_token
+from models.connection import get_async_db, get_read_db, mark_user_write, replica_session_maker, AsyncSessionMaker
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse, Response
+from fastapi import APIRouter, Depends, Form, Header, Query, Request
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.tasks import Tasks
+from models.task_stats import TaskStats
+from models.users import Users
+from models.task_count_cache import task_count_cache
+from models.write_queue import write_queue
+from models.task_versions import task_versions, build_etag, etag_matches
+from models.task_events import task_event_hub, TASK_EVENTS_HEARTBEAT_SECONDS, TASK_EVENTS_MAX_SECONDS, TASK_EVENTS_TOKEN_SECONDS, TASK_CREATED, TASK_UPDATED, TASK_STATUS_CHANGED, TASK_REMOVED
 
 
 router = APIRouter(tags=['Tasks'])
 
+BULK_BATCH_SIZE    = int(os.getenv('BULK_BATCH_SIZE', 500))
+TASK_WRITE_RETRIES = int(os.getenv('TASK_WRITE_RETRIES', 3))
+
 
 class AddTasksModel(BaseModel):
     task_title       : Optional[str]
@@ -35,30 +48,119 @@ class AddTasksModel(BaseModel):
         return values
 
 
+# Response schemas, rows are validated straight from the ORM objects and serialized by orjson
+class TaskListItem(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    task_id          : int
+    task_title       : str
+    task_description : Optional[str]
+    task_due_date    : Optional[date]
+    task_status      : Optional[str]
+
+    @computed_field
+    @property
+    def task_status_name(self) -> str:
+        return task_status_name(self.task_status)
+
+class TaskListData(BaseModel):
+    task_list        : List[TaskListItem]
+    current_page     : Union[int, str]
+    per_page_records : Optional[int]
+    total_pages      : Optional[int]
+    total_records    : Optional[int]
+    next_cursor      : Optional[int]
+    has_more         : bool
+
+class TaskListResponse(BaseModel):
+    status  : int
+    message : str
+    data    : TaskListData
+
+class TaskDetail(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    task_title       : str
+    task_description : Optional[str]
+    task_due_date    : Optional[date]
+    task_status      : Optional[str]
+
+class TaskDetailResponse(BaseModel):
+    status  : int
+    message : str
+    data    : TaskDetail
+
+class TaskStatusCounts(BaseModel):
+    pending    : int = 0
+    processing : int = 0
+    completed  : int = 0
+
+# The due date buckets only count open tasks, a completed task is never overdue
+class TaskStatsData(BaseModel):
+    total_records : int
+    status_counts : TaskStatusCounts
+    overdue       : int
+    due_today     : int
+    due_this_week : int
+    no_due_date   : int
+    today         : date
+    week_end      : date
+
+class TaskStatsResponse(BaseModel):
+    status  : int
+    message : str
+    data    : TaskStatsData
+
+
+# Function to push a task change to the open event streams of the user
+def publish_task_event(user_id, event: str, task, **extra):
+    data = TaskListItem.model_validate(task).model_dump(mode="json") if task is not None else {}
+    task_event_hub.publish(user_id, event, {**data, **extra})
+
+
+# Function to write values to one live task, guarded by the status and due date it was read with
+# A task another request changed in between is read again, returns the updated task with its previous status and due date
+# The task is None when it does not exist and False when it kept changing for TASK_WRITE_RETRIES attempts
+async def change_task(db, user_id, task_id, values: dict):
+    for _ in range(TASK_WRITE_RETRIES):
+        task = await Tasks.find_task_by_task_id_async(db, user_id, task_id)
+        if task is None:
+            return None, None, None
+        previous_status, previous_due_date = task.task_status, task.task_due_date
+        if await Tasks.update_if_unchanged_async(db, user_id, task.task_id, previous_status, previous_due_date, values):
+            await db.refresh(task)
+            return task, previous_status, previous_due_date
+        db.expire(task)
+    return False, None, None
+
+
+# Two adds can pass the title check at the same time, the unique live title index rejects the second one
+def task_exists_response():
+    return JSONResponse({
+        "status" : 500,
+        "message": "Task already exists."
+    }, status_code=500)
+
+
+def task_conflict_response():
+    return JSONResponse({
+        "status" : 500,
+        "message": "Task was changed by another request, please retry."
+    }, status_code=500)
+
+
 
 @router.post("/add-or-edit-task")
 async def add_or_edit_task(
-    request          : Request,
     task_id          : Optional[str] = Form(None),
     task_title       : Optional[str] = Form(None),
     task_description : Optional[str] = Form(None),
     task_due_date    : Optional[str] = Form(None),
     task_status      : Optional[str] = Form(None),
-    db               : DBSession = Depends(get_db),
+    db               : AsyncSession = Depends(get_async_db),
+    current_user     : Users = Depends(get_request_user),
 ):
-    authorization: str = request.headers.get("Authorization")
-    if not authorization:
-        return None
-        # return JSONResponse({
-        #     "status" : 401,
-        #     "message": "please Proper Login."
-        # }, status_code=401)
-
-    scheme, token = authorization.split()
-    user_id = ""
-    if token:
-        get_user = get_current_user(token, db)
-        user_id  = get_user.user_id
+    user_id = current_user.user_id
 
     if task_id == '' or task_id == None:
         try:
@@ -79,50 +181,92 @@ async def add_or_edit_task(
         else:
             task_due_date = None
 
-        check_task = Tasks.check_record(db, task_title)
-        if check_task != None:
-            return JSONResponse({
-                "status" : 500,
-                "message": "Task already exists."
-            }, status_code=500)
+        # The duplicate check runs inside the write job, so it sees writes batched before it
+        # Adds racing past it outside the queue are stopped by the unique live title index
+        async def create_task(db):
+            check_task = await Tasks.check_record_async(db, user_id, task_title)
+            if check_task != None:
+                return None
+
+            task = Tasks(
+                task_user_id        =   user_id,
+                task_title          =   task_title,
+                task_description    =   task_description,
+                task_due_date       =   task_due_date,
+                task_status         =   task_status,
+                updated_at          =   datetime.now(),
+            )
+            db.add(task)
+            await TaskStats.apply_async(db, user_id, Counter({TaskStats.key(task_status, task_due_date): 1}))
+            return task
 
-        create_task = Tasks(
-            task_user_id        =   user_id,
-            task_title          =   task_title,
-            task_description    =   task_description,
-            task_due_date       =   task_due_date,
-            task_status         =   task_status,
-        )
-        db.add(create_task)
-        db.commit()
+        try:
+            created_task = await write_queue.run(db, create_task)
+        except IntegrityError:
+            await db.rollback()
+            created_task = None
+        if created_task == None:
+            return task_exists_response()
+
+        task_count_cache.invalidate(user_id)
+        task_versions.bump(user_id)
+        mark_user_write(user_id)
+        publish_task_event(user_id, TASK_CREATED, created_task)
         return JSONResponse({
             "status" : 200,
             "message": "Task added successfully"
         }, status_code=200)
 
     else:
-        task = Tasks.find_task_by_task_id(db, task_id)
+        if task_due_date == "" or task_due_date == None:
+            task_due_date = None
+        else:
+            task_due_date = datetime.strptime(task_due_date, '%Y-%m-%d').date()
+
+        values = {
+            "task_description" : task_description,
+            "task_due_date"    : task_due_date,
+            "updated_at"       : datetime.now(),
+        }
+        if task_title:
+            values["task_title"] = task_title
+        if task_status is not None:
+            values["task_status"] = task_status
+
+        previous_status = None
+
+        async def edit_task(db):
+            nonlocal previous_status
+            task, previous_status, previous_due_date = await change_task(db, user_id, task_id, values)
+            if not task:
+                return task
+
+            previous_key = TaskStats.key(previous_status, previous_due_date)
+            current_key  = TaskStats.key(task.task_status, task.task_due_date)
+            if current_key != previous_key:
+                await TaskStats.apply_async(db, user_id, Counter({previous_key: -1, current_key: 1}))
+            return task
+
+        try:
+            task = await write_queue.run(db, edit_task)
+        except IntegrityError:
+            await db.rollback()
+            return task_exists_response()
+        if task is False:
+            return task_conflict_response()
         if task==None:
             return JSONResponse({
                 "status" : 500,
                 "message": "Task does not exists"
             }, status_code=500)
 
-        if task_title:
-            task.task_title      =   task_title
-
-        task.task_description    =   task_description
-
-        if task_due_date == "" or task_due_date == None:
-            task.task_due_date = None
+        task_count_cache.invalidate(user_id)
+        task_versions.bump(user_id)
+        mark_user_write(user_id)
+        if task.task_status != previous_status:
+            publish_task_event(user_id, TASK_STATUS_CHANGED, task, previous_status=previous_status)
         else:
-            task.task_due_date = datetime.strptime(task_due_date, '%Y-%m-%d').date()
-
-        if task_status is not None:
-            task.task_status     =   task_status
-
-        task.updated_at          =   datetime.now()
-        db.commit()
+            publish_task_event(user_id, TASK_UPDATED, task)
 
         return JSONResponse({
             "status" : 200,
@@ -131,20 +275,42 @@ async def add_or_edit_task(
 
 
 
+def task_status_name(task_status):
+    if task_status in (1, '1'):
+        return "processing"
+    elif task_status in (2, '2'):
+        return "completed"
+    return "pending"
+
+
+
 # Remove role from database
 @router.post("/task-remove")
 async def remove_task(
     task_id        : Optional[str] = Form(None),
-    db             : DBSession = Depends(get_db),
+    db             : AsyncSession = Depends(get_async_db),
+    current_user   : Users = Depends(get_request_user),
 ):
+    user_id = current_user.user_id
+
     if task_id == "" or task_id == None:
         return JSONResponse({
             "status" : 500,
             "message": "Provide task Id."
         }, status_code=500)
 
-    task = Tasks.find_task_by_task_id(db, task_id)
+    # Only the request whose guarded update matched moves the counter, a concurrent remove of the same task gets "not exists"
+    async def soft_delete_task(db):
+        deleted_at = datetime.now()
+        task, previous_status, previous_due_date = await change_task(db, user_id, task_id, {"deleted_at": deleted_at, "updated_at": deleted_at})
+        if task:
+            await TaskStats.apply_async(db, user_id, Counter({TaskStats.key(previous_status, previous_due_date): -1}))
+        return task
+
+    task = await write_queue.run(db, soft_delete_task)
 
+    if task is False:
+        return task_conflict_response()
     if task is None:
         return JSONResponse({
             "status" : 500,
@@ -152,8 +318,10 @@ async def remove_task(
         }, status_code=500)
 
     if task:
-        task.deleted_at = datetime.now()
-        db.commit()
+        task_count_cache.invalidate(user_id)
+        task_versions.bump(user_id)
+        mark_user_write(user_id)
+        publish_task_event(user_id, TASK_REMOVED, task)
 
         return JSONResponse({
             "status" : 200,
@@ -168,81 +336,491 @@ async def remove_task(
 
 
 # All module and its task list
-@router.post("/task-list")
+@router.post("/task-list", response_model=TaskListResponse)
 async def task_list(
     status_filter : Optional[str] = Form(None),
     skip          : Optional[str] = Form(None),
     search        : Optional[str] = Form(None),
-    db            : DBSession = Depends(get_db)
+    after_task_id : Optional[str] = Form(None),
+    count_mode    : Optional[str] = Form(None),
+    per_page      : Optional[str] = Form(None),
+    if_none_match : Optional[str] = Header(None),
+    db            : AsyncSession = Depends(get_read_db),
+    current_user  : Users = Depends(get_request_user),
 ):
-    if not skip :
+    if not skip and not after_task_id:
         return JSONResponse({
             "status" : 500,
             "message": "Please provide page number."
         },status_code=500)
 
-    task_list    = []
-    limit, tasks, task_count = Tasks.all_tasks(db, status_filter, search, skip)
-
-    for task in tasks:
-        status_name = "pending"
-        if task.task_status in (1, '1'):
-            status_name = "processing"
-        elif task.task_status in (2, '2'):
-            status_name = "completed"
-
-        task_data = {
-            "task_id"           : task.task_id,
-            "task_title"        : task.task_title,
-            "task_description"  : task.task_description,
-            "task_due_date"     : task.task_due_date.strftime('%Y-%m-%d') if task.task_due_date else None,
-            "task_status"       : task.task_status,
-            "task_status_name"  : status_name
-        }
-        task_list.append(task_data)
+    if after_task_id and not (after_task_id.isascii() and after_task_id.isdigit() and int(after_task_id) > 0):
+        return JSONResponse({
+            "status" : 422,
+            "message": "after_task_id must be a positive task id."
+        }, status_code=422)
+
+    # count_mode "has_more" skips the total count query, infinite scroll only needs has_more
+    with_count = count_mode != "has_more"
+    user_id    = current_user.user_id
+
+    # An unchanged version answers a poll with 304 before the page and count queries run
+    etag = build_etag(
+        "task-list", user_id, task_versions.get(user_id), await Tasks.last_updated_async(db, user_id),
+        status_filter, skip, search, after_task_id, count_mode, Tasks.page_size(per_page)
+    )
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    limit, tasks, task_count, next_cursor, has_more = await Tasks.all_tasks_async(
+        db, user_id, status_filter, search, skip, after_task_id, with_count=with_count, per_page=per_page
+    )
 
     # Calculate total records and pages
-    total_records = task_count
+    total_records = task_count if task_count else 0
     total_pages   = (total_records + limit - 1) // limit
 
-    return JSONResponse({
+    response = TaskListResponse.model_validate({
         "status" : 200,
         "message": "Tasks List fetched successfully",
         "data"   : {
-            "task_list"         : task_list,
+            "task_list"         : tasks,
             "current_page"      : skip if skip else 1,
             "per_page_records"  : limit if limit else None,
-            "total_pages"       : total_pages if total_pages else 0,
-            "total_records"     : total_records if total_records else 0
+            "total_pages"       : total_pages if with_count else None,
+            "total_records"     : total_records if with_count else None,
+            "next_cursor"       : next_cursor,
+            "has_more"          : has_more
         }
-    }, status_code=200)
+    })
+    return ORJSONResponse(response.model_dump(), status_code=200, headers={"ETag": etag})
 
 
 
 # All module and its task list
-@router.post("/task-detail")
+@router.post("/task-detail", response_model=TaskDetailResponse)
 async def task_detail(
-    task_id : int = Form(),
-    db      : DBSession = Depends(get_db)
+    task_id       : int = Form(),
+    if_none_match : Optional[str] = Header(None),
+    db            : AsyncSession = Depends(get_read_db),
+    current_user  : Users = Depends(get_request_user),
 ):
-    task = Tasks.find_task_by_task_id(db, task_id)
+    user_id = current_user.user_id
+    etag    = build_etag("task-detail", user_id, task_versions.get(user_id), await Tasks.last_updated_async(db, user_id), task_id)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    task = await Tasks.find_task_by_task_id_async(db, user_id, task_id)
     if not task or task is None:
         return JSONResponse({
             "status" : 500,
             "message": "Task not found."
         }, status_code=500)
 
-    task_data = {
-        "task_title"        : task.task_title,
-        "task_description"  : task.task_description,
-        "task_due_date"     : task.task_due_date.strftime('%Y-%m-%d') if task.task_due_date else None,
-        "task_status"       : task.task_status
-    }
-    return JSONResponse({
+    response = TaskDetailResponse.model_validate({
         "status" : 200,
         "message": f"{task.task_title} detail fetched successfully",
-        "data"   : task_data
+        "data"   : task
+    })
+    return ORJSONResponse(response.model_dump(), status_code=200, headers={"ETag": etag})
+
+
+
+# Status and due date counts of the signed in user, read from the task_stats counters instead of counting tasks
+# today defaults to the server date, a client in another timezone sends its own
+@router.get("/stats", response_model=TaskStatsResponse)
+async def task_stats(
+    today         : Optional[str] = Query(None),
+    if_none_match : Optional[str] = Header(None),
+    db            : AsyncSession = Depends(get_read_db),
+    current_user  : Users = Depends(get_request_user),
+):
+    try:
+        today = datetime.strptime(today, '%Y-%m-%d').date() if today else date.today()
+    except ValueError:
+        return JSONResponse({
+            "status" : 422,
+            "message": "Invalid date, use YYYY-MM-DD."
+        }, status_code=422)
+
+    user_id = current_user.user_id
+    etag    = build_etag("task-stats", user_id, task_versions.get(user_id), await Tasks.last_updated_async(db, user_id), today)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    week_end, rows = await TaskStats.summary_async(db, user_id, today)
+
+    status_counts = Counter()
+    open_counts   = Counter()
+    for row in rows:
+        name = task_status_name(row.task_status)
+        status_counts[name] += row.total
+        if name != "completed":
+            open_counts.update({"overdue": row.overdue, "due_today": row.due_today, "due_this_week": row.due_this_week, "no_due_date": row.no_due_date})
+
+    response = TaskStatsResponse.model_validate({
+        "status" : 200,
+        "message": "Task stats fetched successfully",
+        "data"   : {
+            "total_records" : sum(status_counts.values()),
+            "status_counts" : status_counts,
+            "overdue"       : open_counts["overdue"],
+            "due_today"     : open_counts["due_today"],
+            "due_this_week" : open_counts["due_this_week"],
+            "no_due_date"   : open_counts["no_due_date"],
+            "today"         : today,
+            "week_end"      : week_end
+        }
+    })
+    return ORJSONResponse(response.model_dump(), status_code=200, headers={"ETag": etag})
+
+
+
+# Function to read bulk items from a JSON array body or an NDJSON stream, one dict per item
+async def read_bulk_items(request: Request):
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield parse_bulk_line(line)
+        if buffer.strip():
+            yield parse_bulk_line(buffer)
+    else:
+        try:
+            items = json.loads(await request.body() or b"null")
+        except ValueError:
+            items = None
+        if not isinstance(items, list):
+            raise ValueError("Please provide a JSON array of items.")
+        for item in items:
+            yield item
+
+
+def parse_bulk_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+# Function to group bulk items into batches of BULK_BATCH_SIZE
+async def bulk_batches(request: Request):
+    batch = []
+    async for item in read_bulk_items(request):
+        batch.append(item)
+        if len(batch) >= BULK_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def bulk_result(index, status, message, task_id=None):
+    return {"index": index, "status": status, "message": message, "task_id": task_id}
+
+
+# Function to add bulk tasks in a transaction each, a task whose title was taken in the meantime gets its own failure
+# Results and events go out right after each commit, a later rollback expires the tasks added before it
+async def add_tasks_one_by_one(db, user_id, created, results):
+    for item_index, task in created:
+        try:
+            db.add(task)
+            await TaskStats.apply_async(db, user_id, Counter({TaskStats.key(task.task_status, task.task_due_date): 1}))
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            results.append(bulk_result(item_index, 500, "Task already exists."))
+            continue
+        results.append(bulk_result(item_index, 200, "Task added successfully", task.task_id))
+        publish_task_event(user_id, TASK_CREATED, task)
+
+
+# Bulk import tasks, every item gets its own result
+@router.post("/bulk-add-tasks")
+async def bulk_add_tasks(
+    request      : Request,
+    db           : AsyncSession = Depends(get_async_db),
+    current_user : Users = Depends(get_request_user),
+):
+    user_id = current_user.user_id
+
+    results = []
+    index   = 0
+    try:
+        async for batch in bulk_batches(request):
+            valid = []
+            for item in batch:
+                if not isinstance(item, dict):
+                    results.append(bulk_result(index, 422, "Invalid item."))
+                    index += 1
+                    continue
+                try:
+                    AddTasksModel(
+                        task_title       =   item.get('task_title'),
+                        task_description =   item.get('task_description'),
+                        task_status      =   str(item['task_status']) if item.get('task_status') is not None else None
+                    )
+                    task_due_date = datetime.strptime(item['task_due_date'], '%Y-%m-%d').date() if item.get('task_due_date') else None
+                except (ValueError, TypeError) as e:
+                    message = "; ".join([err['msg'] for err in e.errors()]) if hasattr(e, 'errors') else "Invalid task due date."
+                    results.append(bulk_result(index, 422, message))
+                    index += 1
+                    continue
+                valid.append((index, item, task_due_date))
+                index += 1
+
+            # One set-based query finds titles that already exist
+            existing = await Tasks.existing_titles_async(db, user_id, {item['task_title'] for _, item, _ in valid})
+            created  = []
+            for item_index, item, task_due_date in valid:
+                if item['task_title'] in existing:
+                    results.append(bulk_result(item_index, 500, "Task already exists."))
+                    continue
+                existing.add(item['task_title'])
+                task = Tasks(
+                    task_user_id        =   user_id,
+                    task_title          =   item['task_title'],
+                    task_description    =   item['task_description'],
+                    task_due_date       =   task_due_date,
+                    task_status         =   str(item['task_status']),
+                    updated_at          =   datetime.now(),
+                )
+                created.append((item_index, task))
+
+            try:
+                db.add_all([task for _, task in created])
+                await TaskStats.apply_async(db, user_id, Counter(TaskStats.key(task.task_status, task.task_due_date) for _, task in created))
+                await db.commit()
+            except IntegrityError:
+                # Another request took one of the titles after the check, so the batch is added one task at a time
+                await db.rollback()
+                await add_tasks_one_by_one(db, user_id, created, results)
+            else:
+                for item_index, task in created:
+                    results.append(bulk_result(item_index, 200, "Task added successfully", task.task_id))
+                    publish_task_event(user_id, TASK_CREATED, task)
+    except ValueError as e:
+        return JSONResponse({
+            "status" : 422,
+            "message": str(e)
+        }, status_code=422)
+    finally:
+        task_count_cache.invalidate(user_id)
+        task_versions.bump(user_id)
+        mark_user_write(user_id)
+
+    results.sort(key=lambda result: result["index"])
+    return JSONResponse({
+        "status" : 200,
+        "message": "Bulk task import finished",
+        "data"   : {
+            "results" : results,
+            "created" : sum(1 for result in results if result["status"] == 200),
+            "failed"  : sum(1 for result in results if result["status"] != 200)
+        }
+    }, status_code=200)
+
+
+# Bulk update task status, every item gets its own result
+@router.post("/bulk-update-status")
+async def bulk_update_status(
+    request      : Request,
+    db           : AsyncSession = Depends(get_async_db),
+    current_user : Users = Depends(get_request_user),
+):
+    user_id = current_user.user_id
+
+    results = []
+    index   = 0
+    try:
+        async for batch in bulk_batches(request):
+            valid = []
+            for item in batch:
+                if not isinstance(item, dict) or not item.get('task_id') or item.get('task_status') in (None, ''):
+                    results.append(bulk_result(index, 422, "Task id and task status are required."))
+                elif not str(item['task_id']).isdigit():
+                    results.append(bulk_result(index, 422, "Invalid task id."))
+                else:
+                    valid.append((index, int(item['task_id']), str(item['task_status'])))
+                index += 1
+
+            existing = await Tasks.existing_task_keys_async(db, user_id, {task_id for _, task_id, _ in valid})
+            changes  = []
+            deltas   = Counter()
+            pending  = valid
+            for _ in range(TASK_WRITE_RETRIES):
+                stale = []
+                for item_index, task_id, task_status in pending:
+                    if task_id not in existing:
+                        results.append(bulk_result(item_index, 500, "Task does not exists", task_id))
+                        continue
+                    # Every row is guarded by the state that was read, only matched rows move the counters
+                    # The same task may appear twice in a batch, so its current key is carried forward
+                    previous_status, task_due_date = existing[task_id]
+                    updated_at = datetime.now()
+                    if not await Tasks.update_if_unchanged_async(db, user_id, task_id, previous_status, task_due_date, {"task_status": task_status, "updated_at": updated_at}):
+                        stale.append((item_index, task_id, task_status))
+                        continue
+                    deltas[TaskStats.key(previous_status, task_due_date)] -= 1
+                    deltas[TaskStats.key(task_status, task_due_date)]     += 1
+                    existing[task_id] = (task_status, task_due_date)
+                    changes.append({"task_id": task_id, "task_status": task_status, "updated_at": updated_at})
+                    results.append(bulk_result(item_index, 200, "Task updated successfully", task_id))
+
+                # Tasks another request changed in between are read again and retried in their original order
+                pending = stale
+                if not pending:
+                    break
+                stale_ids = {task_id for _, task_id, _ in pending}
+                for task_id in stale_ids:
+                    existing.pop(task_id, None)
+                existing.update(await Tasks.existing_task_keys_async(db, user_id, stale_ids))
+
+            for item_index, task_id, _ in pending:
+                results.append(bulk_result(item_index, 500, "Task was changed by another request, please retry.", task_id))
+
+            if deltas:
+                await TaskStats.apply_async(db, user_id, deltas)
+            await db.commit()
+            for change in changes:
+                task_event_hub.publish(user_id, TASK_STATUS_CHANGED, {
+                    "task_id"          : change["task_id"],
+                    "task_status"      : change["task_status"],
+                    "task_status_name" : task_status_name(change["task_status"])
+                })
+    except ValueError as e:
+        return JSONResponse({
+            "status" : 422,
+            "message": str(e)
+        }, status_code=422)
+    finally:
+        task_count_cache.invalidate(user_id)
+        task_versions.bump(user_id)
+        mark_user_write(user_id)
+
+    results.sort(key=lambda result: result["index"])
+    return JSONResponse({
+        "status" : 200,
+        "message": "Bulk status update finished",
+        "data"   : {
+            "results" : results,
+            "updated" : sum(1 for result in results if result["status"] == 200),
+            "failed"  : sum(1 for result in results if result["status"] != 200)
+        }
+    }, status_code=200)
+
+
+
+EXPORT_COLUMNS = ["task_id", "task_title", "task_description", "task_due_date", "task_status", "task_status_name"]
+
+# Export every task matching the task-list filters as NDJSON or CSV
+@router.post("/task-export")
+async def task_export(
+    status_filter : Optional[str] = Form(None),
+    search        : Optional[str] = Form(None),
+    export_format : Optional[str] = Form("ndjson"),
+    current_user  : Users = Depends(get_request_user),
+):
+    if export_format not in ("ndjson", "csv"):
+        return JSONResponse({
+            "status" : 422,
+            "message": "Export format must be ndjson or csv."
+        }, status_code=422)
+
+    # The stream outlives the request dependencies, so it owns its session
+    user_id       = current_user.user_id
+    session_maker = replica_session_maker(user_id) or AsyncSessionMaker
+
+    async def export_rows():
+        async with session_maker() as db:
+            if export_format == "csv":
+                yield csv_line(EXPORT_COLUMNS)
+            async for row in Tasks.stream_tasks_async(db, user_id, status_filter, search):
+                values = [
+                    row.task_id,
+                    row.task_title,
+                    row.task_description,
+                    row.task_due_date.strftime('%Y-%m-%d') if row.task_due_date else None,
+                    row.task_status,
+                    task_status_name(row.task_status)
+                ]
+                if export_format == "csv":
+                    yield csv_line(values)
+                else:
+                    yield json.dumps(dict(zip(EXPORT_COLUMNS, values))) + "\n"
+
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(export_rows(), media_type=media_type, headers={
+        "Content-Disposition": f"attachment; filename=tasks.{export_format}"
+    })
+
+
+def csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+
+# Token for opening the event stream from a browser, EventSource cannot send the Authorization header
+# The client opens GET /task/events?token=... and asks for a new token before every reconnect
+@router.post("/events/token")
+async def task_events_token(
+    request      : Request,
+    current_user : Users = Depends(get_request_user),
+):
+    token = create_stream_token(get_token_from_request(request), request.state.user)
+    return JSONResponse({
+        "status" : 200,
+        "message": "Task events token created successfully",
+        "data"   : {
+            "token"      : token,
+            "expires_in" : TASK_EVENTS_TOKEN_SECONDS
+        }
     }, status_code=200)
 
 
 
+# Server-sent events with the task changes of the signed in user, a comment line keeps idle proxies from closing the stream
+@router.get("/events")
+async def task_events(
+    request      : Request,
+    db           : AsyncSession = Depends(get_async_db),
+    current_user : Users = Depends(get_request_user),
+):
+    user_id  = current_user.user_id
+    payload  = getattr(request.state, "user", None) or {}
+    # A stream token expires within a minute, the stream itself may run until the session it came from expires
+    deadline = min(time.time() + TASK_EVENTS_MAX_SECONDS, payload.get("session_exp") or payload.get("exp") or float("inf"))
+
+    # The stream stays open for minutes, so the pooled connection goes back before it starts
+    await db.close()
+
+    queue = task_event_hub.subscribe(user_id)
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return
+                try:
+                    message = await asyncio.wait_for(queue.get(), min(TASK_EVENTS_HEARTBEAT_SECONDS, remaining))
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield f"id: {message['id']}\nevent: {message['event']}\ndata: {orjson.dumps(message['data']).decode()}\n\n"
+        finally:
+            task_event_hub.unsubscribe(user_id, queue)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={
+        "Cache-Control"     : "no-cache",
+        "X-Accel-Buffering" : "no"
+    })